@@ -1,22 +1,278 @@
-from flask import Flask, render_template, request, jsonify, send_file
+import time
+
+# Início da importação do app (relatório de custo de inicialização)
+APP_IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, render_template, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
-import yt_dlp
 import os
 import re
 from pathlib import Path
 import json
-import whisper
+import importlib
+import multiprocessing
 import subprocess
+import sys
 import shutil
+import signal
+import threading
+import uuid
+import bisect
+import fcntl
+import gc
+import gzip
+import hashlib
+import heapq
+import html
+import itertools
+import queue
+import sqlite3
+import mimetypes
+import unicodedata
+import zipfile
+import transcription_worker
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import timedelta
+from multiprocessing.connection import Client, Listener
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+
+class LazyModule:
+    """Importa o módulo no primeiro acesso a um atributo, registrando quanto a importação custou
+
+    whisper (torch), yt_dlp e numpy só entram no processo quando alguma rota
+    realmente os usa; workers que só listam ou entregam arquivos não os carregam.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+        self.import_seconds = None
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    self.import_seconds = time.perf_counter() - started
+                    print(f"Módulo {self._name} importado sob demanda em {self.import_seconds:.2f}s")
+                    self._module = module
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+whisper = LazyModule('whisper')
+yt_dlp = LazyModule('yt_dlp')
+np = LazyModule('numpy')
+LAZY_MODULES = {module._name: module for module in (whisper, yt_dlp, np)}
 
 app = Flask(__name__)
 CORS(app)  # Permite requisições de qualquer origem (útil para desenvolvimento)
 
-# Pasta para salvar os downloads
-DOWNLOAD_FOLDER = Path(__file__).parent / "downloads"
+# Pasta para salvar os downloads (DOWNLOAD_FOLDER permite apontar para outro volume)
+DOWNLOAD_FOLDER = Path(os.getenv('DOWNLOAD_FOLDER') or Path(__file__).parent / "downloads")
 DOWNLOAD_FOLDER.mkdir(exist_ok=True)
 
+# Pasta interna para estado da aplicação (jobs, caches). Fica dentro de downloads
+# para ser persistida pelo mesmo volume do Docker e é ignorada nas listagens.
+STATE_FOLDER = DOWNLOAD_FOLDER / ".app"
+STATE_FOLDER.mkdir(exist_ok=True)
+
+# Banco SQLite de estado compartilhado pelos workers (uma conexão por thread)
+STATE_DB_PATH = STATE_FOLDER / "state.db"
+_state_db_local = threading.local()
+
+def get_state_db():
+    """Retorna a conexão SQLite da thread atual com o banco de estado"""
+    conn = getattr(_state_db_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(str(STATE_DB_PATH), timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        _state_db_local.conn = conn
+    return conn
+
+# Métricas no formato Prometheus, mantidas em memória por processo
+METRICS_FOLDER = STATE_FOLDER / "metrics"
+METRICS_FOLDER.mkdir(exist_ok=True)
+# Intervalo com que cada worker publica seu snapshot para os demais somarem no /metrics
+METRICS_FLUSH_SECONDS = int(os.getenv('METRICS_FLUSH_SECONDS', '15'))
+METRICS_PREFIX = 'ytdownloader_'
+METRICS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+METRICS_HELP = {
+    'stage_duration_seconds': ('histogram', 'Duração de cada etapa (info_extract, download, subtitle_download, audio_extract, inference, vtt_write, clip_cut, probe); no modo stream, audio_extract é o tempo de decodificação do ffmpeg, que corre junto com a inference'),
+    'strategy_attempts_total': ('counter', 'Tentativas de download por estratégia e resultado'),
+    'downloaded_bytes_total': ('counter', 'Bytes baixados pelo yt-dlp'),
+    'clips_created_total': ('counter', 'Cortes criados (reels e aulas)'),
+}
+
+def process_start_time(pid):
+    """Início do processo em ticks desde o boot (None fora do Linux), para distinguir PIDs reaproveitados"""
+    try:
+        stat = Path(f'/proc/{pid}/stat').read_text()
+    except OSError:
+        return None
+    # O nome do processo (campo 2) pode ter espaços; starttime é o 22º campo
+    return int(stat.rsplit(')', 1)[1].split()[19])
+
+class Metrics:
+    """Contadores e histogramas baratos de atualizar; o texto só é montado quando alguém coleta"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # (nome, labels) -> valor
+        self._histograms = {}  # (nome, labels) -> [contagens por bucket, soma, total]
+        self._dirty = False
+        self._flusher = None
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+            self._dirty = True
+        self._ensure_flusher()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect.bisect_left(METRICS_BUCKETS, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(METRICS_BUCKETS), 0.0, 0]
+            if index < len(METRICS_BUCKETS):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+            self._dirty = True
+        self._ensure_flusher()
+
+    @contextmanager
+    def time_stage(self, stage):
+        """Mede a duração de uma etapa (também quando ela termina com erro)"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe('stage_duration_seconds', time.monotonic() - started, stage=stage)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(h[0]), h[1], h[2]] for (name, labels), h in self._histograms.items()],
+            }
+
+    def _ensure_flusher(self):
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            if self._dirty:
+                self._dirty = False
+                self.flush()
+
+    def flush(self):
+        """Publica o snapshot deste processo para os outros workers do gunicorn"""
+        metrics_file = METRICS_FOLDER / f"{os.getpid()}-{process_start_time(os.getpid()) or 0}.json"
+        tmp_file = metrics_file.with_suffix('.tmp')
+        try:
+            tmp_file.write_text(json.dumps(self.snapshot()), encoding='utf-8')
+            os.replace(tmp_file, metrics_file)
+        except OSError as e:
+            print(f"Não foi possível publicar métricas: {e}")
+
+    def collect(self):
+        """Soma o estado deste processo com os snapshots dos outros workers vivos"""
+        snapshots = [self.snapshot()]
+        own_pid = os.getpid()
+        for metrics_file in METRICS_FOLDER.glob('*.json'):
+            try:
+                pid, started = (int(part) for part in metrics_file.stem.split('-'))
+            except ValueError:
+                # Formato antigo (só o PID): não dá para saber se é deste boot
+                metrics_file.unlink(missing_ok=True)
+                continue
+            if pid == own_pid and started == (process_start_time(pid) or 0):
+                continue
+            try:
+                os.kill(pid, 0)
+                alive = pid != own_pid
+            except ProcessLookupError:
+                alive = False
+            except PermissionError:
+                alive = True
+            # Depois de reiniciar o container os PIDs se repetem: vale o início do processo
+            if not alive or started != (process_start_time(pid) or 0):
+                metrics_file.unlink(missing_ok=True)
+                continue
+            try:
+                snapshots.append(json.loads(metrics_file.read_text(encoding='utf-8')))
+            except (OSError, ValueError):
+                continue
+        counters = {}
+        histograms = {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, buckets, total_sum, count in snapshot['histograms']:
+                key = (name, tuple(tuple(label) for label in labels))
+                merged = histograms.setdefault(key, [[0] * len(METRICS_BUCKETS), 0.0, 0])
+                merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+                merged[1] += total_sum
+                merged[2] += count
+        return counters, histograms
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        counters, histograms = self.collect()
+
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+            return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+        lines = []
+        for name, (metric_type, help_text) in METRICS_HELP.items():
+            full_name = METRICS_PREFIX + name
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            if metric_type == 'counter':
+                for (counter_name, labels), value in sorted(counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{full_name}{label_text(labels)} {value}")
+                continue
+            for (histogram_name, labels), (buckets, total_sum, count) in sorted(histograms.items()):
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(METRICS_BUCKETS, buckets):
+                    cumulative += bucket_count
+                    lines.append(f"{full_name}_bucket{label_text(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{full_name}_bucket{label_text(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{full_name}_sum{label_text(labels)} {total_sum}")
+                lines.append(f"{full_name}_count{label_text(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+
 LESSONS_FOLDER_NAME = "assuntos"
 VIDEO_EXTENSIONS = ['.mp4', '.webm', '.mkv', '.m4a', '.mp3']
 SUBTITLE_LANGS = ['pt', 'pt-BR', 'pt-PT']
@@ -70,24 +326,169 @@ def get_common_opts():
     
     return opts
 
+# Cache de metadados do /api/info: URLs normalizadas, com TTL e tamanho máximo
+INFO_CACHE_TTL = int(os.getenv('INFO_CACHE_TTL', '600'))
+INFO_CACHE_SIZE = int(os.getenv('INFO_CACHE_SIZE', '256'))
+YOUTUBE_HOSTS = {'youtube.com', 'm.youtube.com', 'music.youtube.com', 'youtu.be', 'youtube-nocookie.com'}
+
+class CoalescingTTLCache:
+    """Cache LRU com expiração que junta chamadas concorrentes para a mesma chave"""
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # chave -> (expira_em, valor)
+        self._pending = {}  # chave -> Future da extração em andamento
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_compute(self, key, compute, cacheable=lambda value: True):
+        """Retorna o valor em cache ou calcula uma única vez, mesmo com chamadas simultâneas"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = Future()
+                self._pending[key] = pending
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not owner:
+            return pending.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            del self._pending[key]
+            if cacheable(value):
+                self._entries[key] = (time.time() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        pending.set_result(value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+            }
+
+info_cache = CoalescingTTLCache(INFO_CACHE_TTL, INFO_CACHE_SIZE)
+
+def normalize_video_url(url):
+    """Normaliza a URL para uso como chave de cache (mesmo vídeo/playlist = mesma chave)"""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if host in YOUTUBE_HOSTS:
+        params = dict(parse_qsl(parts.query))
+        if host == 'youtu.be':
+            params['v'] = parts.path.strip('/')
+            path = '/watch'
+        else:
+            path = parts.path.rstrip('/') or '/'
+            # /shorts/<id> e /live/<id> são o mesmo vídeo que /watch?v=<id>
+            match = re.match(r'^/(?:shorts|live|embed)/([^/]+)$', path)
+            if match:
+                params['v'] = match.group(1)
+                path = '/watch'
+        # Mantém apenas o que identifica o conteúdo (descarta t, si, feature, index...)
+        query = urlencode(sorted((k, v) for k, v in params.items() if k in ('v', 'list')))
+        return urlunsplit(('https', 'youtube.com', path, query, ''))
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower() or 'https', parts.netloc.lower(), parts.path, query, ''))
+
 def get_video_info(url):
-    """Obtém informações do vídeo ou playlist sem baixar"""
+    """Obtém informações do vídeo ou playlist sem baixar (com cache e coalescência)"""
+    return info_cache.get_or_compute(
+        normalize_video_url(url),
+        lambda: extract_video_info(url),
+        cacheable=lambda info: 'error' not in info
+    )
+
+# Resultado do extract_info salvo para o /api/download reaproveitar sem nova extração
+INFO_TOKEN_TTL = int(os.getenv('INFO_TOKEN_TTL', '3600'))
+INFO_TOKENS_FOLDER = STATE_FOLDER / "info"
+INFO_TOKENS_FOLDER.mkdir(exist_ok=True)
+
+def save_info_token(ydl, info, url):
+    """Persiste o info dict da URL como JSON com validade e retorna um token opaco"""
+    now = time.time()
+    for token_file in INFO_TOKENS_FOLDER.glob('*.json'):
+        try:
+            if token_file.stat().st_mtime < now - INFO_TOKEN_TTL:
+                token_file.unlink()
+        except OSError:
+            pass
+    token = uuid.uuid4().hex
+    token_file = INFO_TOKENS_FOLDER / f"{token}.json"
+    tmp_file = token_file.with_suffix('.tmp')
+    tmp_file.write_text(json.dumps({
+        'expires_at': now + INFO_TOKEN_TTL,
+        'url': normalize_video_url(url),
+        'info': ydl.sanitize_info(info),
+    }), encoding='utf-8')
+    os.replace(tmp_file, token_file)
+    return token
+
+def load_info_token(token, url):
+    """Retorna o info dict salvo para o token, ou None se inválido/expirado ou de outra URL"""
+    if not re.fullmatch(r'[0-9a-f]{32}', token or ''):
+        return None
+    token_file = INFO_TOKENS_FOLDER / f"{token}.json"
+    try:
+        payload = json.loads(token_file.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if payload.get('expires_at', 0) < time.time():
+        try:
+            token_file.unlink()
+        except OSError:
+            pass
+        return None
+    # Token antigo ou URL editada depois da consulta: o info seria de outro vídeo
+    if payload.get('url') != normalize_video_url(url):
+        return None
+    return payload.get('info')
+
+def extract_video_info(url):
+    """Extrai informações do vídeo ou playlist com o yt-dlp"""
     ydl_opts = {
         **get_common_opts(),
         'quiet': True,
         'no_warnings': True,
-        'extract_flat': False,  # Extrai informações completas
+        # Playlists são listadas sem resolver cada vídeo; vídeos únicos vêm completos
+        'extract_flat': 'in_playlist',
         'listsubtitles': True,  # Lista legendas disponíveis
     }
     
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+            with metrics.time_stage('info_extract'):
+                info = ydl.extract_info(url, download=False)
             
             # Verifica legendas disponíveis
             available_subtitles = {}
             if 'subtitles' in info:
-                available_subtitles = info.get('subtitles', {})
+                # Cópia: o info original é reaproveitado no download (info_token)
+                available_subtitles = dict(info.get('subtitles') or {})
             if 'automatic_captions' in info:
                 auto_captions = info.get('automatic_captions', {})
                 # Mescla legendas automáticas
@@ -104,12 +505,14 @@ def get_video_info(url):
                 entries = list(info.get('entries', []))
                 # Remove entradas None
                 entries = [e for e in entries if e is not None]
+                info['entries'] = entries
                 
                 return {
+                    'info_token': save_info_token(ydl, info, url),
                     'is_playlist': True,
                     'title': info.get('title', 'Playlist sem título'),
                     'uploader': info.get('uploader', 'Desconhecido'),
-                    'playlist_count': len(entries),
+                    'playlist_count': info.get('playlist_count') or len(entries),
                     'thumbnail': info.get('thumbnail', ''),
                     'has_subtitles': has_portuguese,
                     'available_subtitle_langs': list(available_subtitles.keys()),
@@ -126,6 +529,7 @@ def get_video_info(url):
             else:
                 # É um vídeo único
                 return {
+                    'info_token': save_info_token(ydl, info, url),
                     'is_playlist': False,
                     'title': info.get('title', 'Sem título'),
                     'duration': info.get('duration', 0),
@@ -138,8 +542,390 @@ def get_video_info(url):
     except Exception as e:
         return {'error': str(e)}
 
-def download_video(url, quality='best', is_playlist=False, download_subtitles=False):
-    """Baixa o vídeo ou playlist do YouTube com fallback para evitar 403"""
+PLAYLIST_PAGE_MAX = 50
+
+def get_playlist_page(url, offset=0, limit=10):
+    """Retorna uma página da playlist com metadados completos só dos vídeos da página"""
+    offset = max(0, int(offset))
+    limit = max(1, min(int(limit), PLAYLIST_PAGE_MAX))
+    key = f"{normalize_video_url(url)}#items={offset}:{limit}"
+    return info_cache.get_or_compute(
+        key,
+        lambda: extract_playlist_page(url, offset, limit),
+        cacheable=lambda page: 'error' not in page
+    )
+
+def extract_playlist_page(url, offset, limit):
+    """Extrai com o yt-dlp apenas os itens offset+1..offset+limit da playlist"""
+    ydl_opts = {
+        **get_common_opts(),
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': False,
+        'noplaylist': False,
+        'playlist_items': f'{offset + 1}:{offset + limit}',
+        'ignoreerrors': True,  # Vídeo privado/removido não derruba a página inteira
+    }
+    try:
+        # O total vem da listagem plana (normalmente já em cache)
+        summary = get_video_info(url)
+        if 'error' in summary:
+            return summary
+        if not summary.get('is_playlist'):
+            return {'error': 'A URL não é uma playlist'}
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            with metrics.time_stage('info_extract'):
+                info = ydl.extract_info(url, download=False)
+        entries = []
+        for index, entry in enumerate(info.get('entries') or [], offset + 1):
+            if entry is None:
+                continue
+            subtitle_langs = set(entry.get('subtitles') or {}) | set(entry.get('automatic_captions') or {})
+            entries.append({
+                'index': entry.get('playlist_index') or index,
+                'id': entry.get('id', ''),
+                'title': entry.get('title', 'Sem título'),
+                'duration': entry.get('duration', 0),
+                'url': entry.get('webpage_url') or entry.get('url', ''),
+                'thumbnail': entry.get('thumbnail', ''),
+                'uploader': entry.get('uploader', 'Desconhecido'),
+                'view_count': entry.get('view_count', 0),
+                'has_subtitles': any(lang.startswith('pt') for lang in subtitle_langs),
+            })
+        return {
+            'is_playlist': True,
+            'title': summary.get('title'),
+            'playlist_count': summary.get('playlist_count'),
+            'offset': offset,
+            'limit': limit,
+            'entries': entries,
+        }
+    except Exception as e:
+        return {'error': str(e)}
+
+# Downloads concorrentes: limite global, cortesia por host e playlists em paralelo
+PLAYLIST_WORKERS = int(os.getenv('PLAYLIST_WORKERS', '3'))
+DOWNLOAD_MAX_CONCURRENCY = int(os.getenv('DOWNLOAD_MAX_CONCURRENCY', '4'))
+HOST_MAX_CONCURRENCY = int(os.getenv('HOST_MAX_CONCURRENCY', '3'))
+HOST_MIN_INTERVAL = float(os.getenv('HOST_MIN_INTERVAL', '1.0'))
+
+# Vagas compartilhadas entre os workers do gunicorn: cada vaga é um arquivo com flock, que o
+# sistema libera sozinho se o processo morrer no meio do download
+LOCKS_FOLDER = STATE_FOLDER / "locks"
+LOCKS_FOLDER.mkdir(exist_ok=True)
+DOWNLOAD_SLOT_POLL_SECONDS = 0.2
+
+@contextmanager
+def shared_slot(name, capacity):
+    """Ocupa uma das `capacity` vagas de `name`, esperando se todas estiverem em uso"""
+    while True:
+        for index in range(capacity):
+            fd = os.open(LOCKS_FOLDER / f'{name}.{index}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            try:
+                yield
+            finally:
+                os.close(fd)  # Fechar o descritor libera o lock
+            return
+        time.sleep(DOWNLOAD_SLOT_POLL_SECONDS)
+
+class HostThrottle:
+    """Limita downloads simultâneos por host e espaça o início de cada um, entre todos os workers"""
+
+    def __init__(self, max_concurrency, min_interval):
+        self.max_concurrency = max_concurrency
+        self.min_interval = min_interval
+        conn = get_state_db()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS download_hosts (
+                    host TEXT PRIMARY KEY,
+                    next_start REAL NOT NULL
+                )
+            """)
+
+    def _reserve_start(self, host):
+        """Reserva o próximo horário de início livre do host (relógio de parede, comum aos processos)"""
+        now = time.time()
+        conn = get_state_db()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT next_start FROM download_hosts WHERE host = ?', (host,)).fetchone()
+            start_at = max(now, row['next_start'] if row else 0)
+            conn.execute(
+                'INSERT OR REPLACE INTO download_hosts (host, next_start) VALUES (?, ?)',
+                (host, start_at + self.min_interval)
+            )
+        return start_at - now
+
+    @contextmanager
+    def slot(self, url):
+        host = (urlsplit(url).hostname or '').lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        with shared_slot('host-' + re.sub(r'[^a-z0-9.-]', '_', host), self.max_concurrency):
+            delay = self._reserve_start(host)
+            if delay > 0:
+                time.sleep(delay)
+            yield
+
+host_throttle = HostThrottle(HOST_MAX_CONCURRENCY, HOST_MIN_INTERVAL)
+
+@contextmanager
+def download_slot(url):
+    """Reserva uma vaga no limite global de downloads e no limite do host"""
+    with shared_slot('download', DOWNLOAD_MAX_CONCURRENCY):
+        with host_throttle.slot(url):
+            yield
+
+def playlist_entries_from_info(info):
+    """Converte as entradas (planas) de um info de playlist em [{index, url, title}]"""
+    entries = []
+    for index, entry in enumerate(info.get('entries') or [], 1):
+        if not entry:
+            continue
+        entry_url = entry.get('url') or entry.get('webpage_url')
+        if not entry_url and entry.get('id'):
+            entry_url = f"https://www.youtube.com/watch?v={entry['id']}"
+        if entry_url:
+            entries.append({'index': index, 'url': entry_url, 'title': entry.get('title', 'Sem título')})
+    return entries
+
+def list_playlist_entries(url):
+    """Lista todas as entradas da playlist sem resolver cada vídeo (extração plana)"""
+    ydl_opts = {
+        **get_common_opts(),
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': 'in_playlist',
+        'noplaylist': False,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with metrics.time_stage('info_extract'):
+            info = ydl.extract_info(url, download=False)
+    return info.get('title') or 'Playlist', playlist_entries_from_info(info)
+
+def download_playlist_concurrently(url, quality, download_subtitles, progress_hook=None, info=None):
+    """Baixa as entradas da playlist em paralelo, cada uma com seu próprio YoutubeDL"""
+    try:
+        if info and info.get('entries'):
+            # Listagem já feita pelo /api/info (info_token)
+            playlist_title, entries = info.get('title') or 'Playlist', playlist_entries_from_info(info)
+        else:
+            playlist_title, entries = list_playlist_entries(url)
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+    if not entries:
+        return {'success': False, 'error': 'Playlist vazia ou indisponível'}
+
+    playlist_folder = DOWNLOAD_FOLDER / yt_dlp.utils.sanitize_filename(playlist_title)
+    playlist_folder.mkdir(exist_ok=True)
+    print(f"Baixando {len(entries)} vídeo(s) da playlist {playlist_title} com {PLAYLIST_WORKERS} workers")
+
+    def download_entry(entry):
+        return download_video(
+            entry['url'], quality, False, download_subtitles,
+            progress_hook=progress_hook, output_dir=playlist_folder, auto_reels=False
+        )
+
+    with ThreadPoolExecutor(max_workers=PLAYLIST_WORKERS, thread_name_prefix='playlist') as executor:
+        results = list(executor.map(download_entry, entries))
+
+    downloaded_files = []
+    errors = []
+    for entry, result in zip(entries, results):
+        if not result.get('success'):
+            errors.append({'title': entry['title'], 'url': entry['url'], 'error': result.get('error')})
+            continue
+        file_info = {
+            'filename': os.path.basename(result['path']),
+            'path': result['path'],
+            'title': result.get('title', entry['title'])
+        }
+        if result.get('subtitle'):
+            file_info['subtitle'] = result['subtitle']
+        downloaded_files.append(file_info)
+
+    if not downloaded_files:
+        return {
+            'success': False,
+            'error': errors[0]['error'] if errors else 'Nenhum vídeo baixado',
+            'errors': errors
+        }
+    return {
+        'success': True,
+        'is_playlist': True,
+        'files': downloaded_files,
+        'count': len(downloaded_files),
+        'playlist_title': playlist_title,
+        'subtitles_downloaded': any('subtitle' in f for f in downloaded_files),
+        'errors': errors
+    }
+
+def download_video(url, quality='best', is_playlist=False, download_subtitles=False, progress_hook=None,
+                   output_dir=None, auto_reels=True, info=None):
+    """Baixa o vídeo ou playlist do YouTube com fallback para evitar 403
+
+    `info` é um info dict já extraído (via info_token do /api/info); só é usado
+    se o tipo (vídeo ou playlist) bater com o download pedido.
+    """
+    if info and (info.get('_type') == 'playlist') != bool(is_playlist):
+        info = None
+    if is_playlist and PLAYLIST_WORKERS > 1:
+        return download_playlist_concurrently(url, quality, download_subtitles, progress_hook, info)
+    with download_slot(url):
+        return download_with_strategies(url, quality, is_playlist, download_subtitles, progress_hook,
+                                        output_dir, auto_reels, info)
+
+# Estratégias diferentes para tentar evitar 403 e detecção de bot
+# Ordem: mais modernos primeiro (menos detecção)
+DOWNLOAD_STRATEGIES = [
+    {
+        'name': 'mweb_client',
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['mweb'],
+                'player_skip': ['webpage', 'configs'],
+            }
+        }
+    },
+    {
+        'name': 'android_embedded',
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['android_embedded'],
+                'player_skip': ['webpage', 'configs'],
+            }
+        }
+    },
+    {
+        'name': 'android',
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['android'],
+                'player_skip': ['webpage', 'configs'],
+            }
+        }
+    },
+    {
+        'name': 'ios',
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['ios'],
+                'player_skip': ['webpage', 'configs'],
+            }
+        }
+    },
+    {
+        'name': 'web',
+        'extractor_args': {
+            'youtube': {
+                'player_client': ['web'],
+            }
+        }
+    },
+]
+
+
+# Placar das estratégias de cliente do YouTube, compartilhado entre os workers pelo SQLite
+STRATEGY_HALF_LIFE = float(os.getenv('STRATEGY_HALF_LIFE', '3600'))
+STRATEGY_LATENCY_ALPHA = 0.3  # Peso da última tentativa na média móvel de latência
+
+class StrategyScoreboard:
+    """Registra sucessos, 403s e latência por player_client com decaimento exponencial"""
+
+    def __init__(self, half_life):
+        self.half_life = half_life
+        conn = get_state_db()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS strategy_stats (
+                    name TEXT PRIMARY KEY,
+                    successes REAL NOT NULL DEFAULT 0,
+                    forbidden REAL NOT NULL DEFAULT 0,
+                    latency REAL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def _decay(self, updated_at, now):
+        return 0.5 ** (max(0.0, now - updated_at) / self.half_life)
+
+    def record(self, name, success, latency):
+        """Registra o resultado de uma tentativa (sucesso ou 403)"""
+        now = time.time()
+        conn = get_state_db()
+        with conn:
+            # Leitura e escrita na mesma transação: outros workers esperam a vez
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT * FROM strategy_stats WHERE name = ?', (name,)).fetchone()
+            successes = forbidden = 0.0
+            average_latency = None
+            if row:
+                decay = self._decay(row['updated_at'], now)
+                successes = row['successes'] * decay
+                forbidden = row['forbidden'] * decay
+                average_latency = row['latency']
+            if success:
+                successes += 1
+            else:
+                forbidden += 1
+            if average_latency is None:
+                average_latency = latency
+            else:
+                average_latency += STRATEGY_LATENCY_ALPHA * (latency - average_latency)
+            conn.execute(
+                'INSERT OR REPLACE INTO strategy_stats VALUES (?, ?, ?, ?, ?)',
+                (name, successes, forbidden, average_latency, now)
+            )
+
+    def snapshot(self):
+        """Retorna estatísticas decaídas até agora, por nome de estratégia"""
+        now = time.time()
+        stats = {}
+        for row in get_state_db().execute('SELECT * FROM strategy_stats'):
+            decay = self._decay(row['updated_at'], now)
+            successes = row['successes'] * decay
+            forbidden = row['forbidden'] * decay
+            stats[row['name']] = {
+                'successes': round(successes, 3),
+                'forbidden': round(forbidden, 3),
+                # Prior de Laplace: estratégias sem histórico começam em 0.5
+                'expected_success': round((successes + 1) / (successes + forbidden + 2), 4),
+                'forbidden_rate': round(forbidden / (successes + forbidden), 4) if successes + forbidden else None,
+                'latency_seconds': round(row['latency'], 2) if row['latency'] is not None else None,
+                'updated_at': row['updated_at'],
+            }
+        return stats
+
+    def order(self, strategies):
+        """Ordena as estratégias pela chance de sucesso atual (empate mantém a ordem padrão)"""
+        stats = self.snapshot()
+        ranked = sorted(
+            enumerate(strategies),
+            key=lambda item: (-stats.get(item[1]['name'], {}).get('expected_success', 0.5), item[0])
+        )
+        return [strategy for _, strategy in ranked]
+
+strategy_scoreboard = StrategyScoreboard(STRATEGY_HALF_LIFE)
+
+def count_downloaded_bytes(d):
+    """Progress hook do yt-dlp que soma os bytes de cada arquivo concluído nas métricas"""
+    if d.get('status') == 'finished':
+        metrics.inc('downloaded_bytes_total', d.get('downloaded_bytes') or d.get('total_bytes') or 0)
+
+def download_with_strategies(url, quality, is_playlist, download_subtitles, progress_hook=None,
+                             output_dir=None, auto_reels=True, info=None):
+    """Baixa com o yt-dlp tentando cada estratégia de cliente até evitar o 403
+
+    Com `info`, a primeira tentativa pula a extração e vai direto para a seleção
+    de formato e download (process_ie_result); se ela falhar com 403, segue para
+    as estratégias normais.
+    """
     # Se a URL tem parâmetro list= mas is_playlist é False, remove o parâmetro list
     if not is_playlist and 'list=' in url:
         # Remove o parâmetro list da URL para baixar apenas o vídeo
@@ -153,8 +939,8 @@ def download_video(url, quality='best', is_playlist=False, download_subtitles=Fa
         output_path = DOWNLOAD_FOLDER / "%(playlist_title)s" / "%(title)s.%(ext)s"
         subtitle_path = DOWNLOAD_FOLDER / "%(playlist_title)s" / "%(title)s.%(ext)s"
     else:
-        output_path = DOWNLOAD_FOLDER / "%(title)s.%(ext)s"
-        subtitle_path = DOWNLOAD_FOLDER / "%(title)s.%(ext)s"
+        output_path = (output_dir or DOWNLOAD_FOLDER) / "%(title)s.%(ext)s"
+        subtitle_path = (output_dir or DOWNLOAD_FOLDER) / "%(title)s.%(ext)s"
     
     # Simplifica o formato para evitar problemas de merge que podem travar
     format_selector = quality
@@ -166,60 +952,15 @@ def download_video(url, quality='best', is_playlist=False, download_subtitles=Fa
     elif quality == 'bestvideo+bestaudio':
         format_selector = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
     
-    # Estratégias diferentes para tentar evitar 403 e detecção de bot
-    # Ordem: mais modernos primeiro (menos detecção)
-    strategies = [
-        {
-            'name': 'mweb_client',
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['mweb'],
-                    'player_skip': ['webpage', 'configs'],
-                }
-            }
-        },
-        {
-            'name': 'android_embedded',
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['android_embedded'],
-                    'player_skip': ['webpage', 'configs'],
-                }
-            }
-        },
-        {
-            'name': 'android',
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['android'],
-                    'player_skip': ['webpage', 'configs'],
-                }
-            }
-        },
-        {
-            'name': 'ios',
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['ios'],
-                    'player_skip': ['webpage', 'configs'],
-                }
-            }
-        },
-        {
-            'name': 'web',
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['web'],
-                }
-            }
-        },
-    ]
-    
     downloaded_files = []
     last_error = None
     
-    # Tenta cada estratégia
+    # Tenta cada estratégia, na ordem de maior chance de sucesso recente
+    strategies = strategy_scoreboard.order(DOWNLOAD_STRATEGIES)
+    if info:
+        strategies = [{'name': 'info_token', 'extractor_args': {}, 'info': info}] + strategies
     for strategy_idx, strategy in enumerate(strategies, 1):
+        attempt_started = time.monotonic()
         try:
             ydl_opts = {
                 **get_common_opts(),
@@ -229,7 +970,7 @@ def download_video(url, quality='best', is_playlist=False, download_subtitles=Fa
                 'no_warnings': False,
                 'merge_output_format': 'mp4',
                 'extractor_args': strategy['extractor_args'],
-                'progress_hooks': [],  # Pode adicionar hooks de progresso aqui
+                'progress_hooks': [count_downloaded_bytes] + ([progress_hook] if progress_hook else []),
             }
             
             # Configura download de legendas/transcrições em português
@@ -249,7 +990,14 @@ def download_video(url, quality='best', is_playlist=False, download_subtitles=Fa
             print(f"Tentando estratégia {strategy_idx}/{len(strategies)}: {strategy['name']}")
             
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+                with metrics.time_stage('download'):
+                    if strategy.get('info'):
+                        info = ydl.process_ie_result(strategy['info'], download=True)
+                    else:
+                        info = ydl.extract_info(url, download=True)
+                metrics.inc('strategy_attempts_total', strategy=strategy['name'], result='success')
+                if not strategy.get('info'):
+                    strategy_scoreboard.record(strategy['name'], True, time.monotonic() - attempt_started)
                 
                 if 'entries' in info and info.get('entries'):
                     # Playlist baixada
@@ -284,6 +1032,7 @@ def download_video(url, quality='best', is_playlist=False, download_subtitles=Fa
                                 
                                 downloaded_files.append(file_info)
                     
+                    media_index.update_paths([f['path'] for f in downloaded_files] + subtitle_files)
                     return {
                         'success': True,
                         'is_playlist': True,
@@ -332,8 +1081,10 @@ def download_video(url, quality='best', is_playlist=False, download_subtitles=Fa
                         if 'subtitles_downloaded' not in result:
                             result['subtitles_downloaded'] = False
                     
+                    media_index.update_paths([actual_file, subtitle_file_path])
+                    
                     # Cria reels automaticamente se tiver legendas
-                    if subtitle_file_path and download_subtitles:
+                    if subtitle_file_path and download_subtitles and auto_reels:
                         try:
                             print(f"Criando reels automaticamente para {actual_file}...")
                             segments = parse_vtt_file(Path(subtitle_file_path))
@@ -341,7 +1092,7 @@ def download_video(url, quality='best', is_playlist=False, download_subtitles=Fa
                                 viral_moments = analyze_viral_moments(segments, 15, 60)
                                 if viral_moments:
                                     clips_folder = Path(actual_file).parent / f"{Path(actual_file).stem}_reels"
-                                    clips = create_video_clips(Path(actual_file), viral_moments, clips_folder)
+                                    clips, _ = create_video_clips(Path(actual_file), viral_moments, clips_folder)
                                     if clips:
                                         result['reels_created'] = True
                                         result['reels_count'] = len(clips)
@@ -355,13 +1106,18 @@ def download_video(url, quality='best', is_playlist=False, download_subtitles=Fa
             error_str = str(e)
             last_error = error_str
             print(f"Erro na estratégia {strategy['name']}: {error_str}")
-            # Se não for erro 403, retorna imediatamente
-            if '403' not in error_str and 'Forbidden' not in error_str:
+            forbidden = '403' in error_str or 'Forbidden' in error_str
+            metrics.inc('strategy_attempts_total', strategy=strategy['name'], result='forbidden' if forbidden else 'error')
+            # Se não for erro 403, retorna imediatamente (exceto na tentativa com
+            # info_token: qualquer falha ali volta para a extração normal)
+            if not strategy.get('info') and not forbidden:
                 return {
                     'success': False,
                     'error': error_str
                 }
-            # Se for 403, continua para próxima estratégia
+            # Se for 403, registra no placar e continua para próxima estratégia
+            if not strategy.get('info'):
+                strategy_scoreboard.record(strategy['name'], False, time.monotonic() - attempt_started)
             continue
     
     # Se todas as estratégias falharam
@@ -370,6 +1126,495 @@ def download_video(url, quality='best', is_playlist=False, download_subtitles=Fa
         'error': f'Erro após tentar todas as estratégias. Último erro: {last_error}'
     }
 
+# Índice persistente dos arquivos em downloads/ (vídeos, legendas, transcrições, reels)
+INDEXED_EXTENSIONS = VIDEO_EXTENSIONS + ['.vtt', '.txt']
+MEDIA_INDEX_RECONCILE_SECONDS = int(os.getenv('MEDIA_INDEX_RECONCILE_SECONDS', '300'))
+
+class MediaIndex:
+    """Índice SQLite dos arquivos de mídia, atualizado nas escritas e reconciliado com o disco"""
+
+    def __init__(self, root):
+        self.root = root
+        self._reconcile_lock = threading.Lock()
+        self.last_reconcile = 0
+        # Chamados com os caminhos relativos alterados/removidos (None = reconciliação completa)
+        self.listeners = []
+        conn = get_state_db()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS media_files (
+                    path TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    folder TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    duration REAL,
+                    type TEXT NOT NULL,
+                    course TEXT
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS media_files_name ON media_files (name)')
+            conn.execute('CREATE INDEX IF NOT EXISTS media_files_folder ON media_files (folder)')
+
+    def relative(self, path):
+        return Path(path).resolve().relative_to(self.root.resolve()).as_posix()
+
+    @staticmethod
+    def classify(rel_path):
+        """Retorna (tipo, curso) de um arquivo a partir do caminho relativo"""
+        parts = rel_path.split('/')
+        name = parts[-1]
+        if len(parts) > 1 and parts[-2].endswith('_reels'):
+            file_type = 'reel'
+        elif name.endswith('.vtt'):
+            file_type = 'subtitle'
+        elif name.endswith('.txt') and '_whisper' in name:
+            file_type = 'transcript'
+        else:
+            file_type = 'video'
+        course = parts[0] if len(parts) > 1 and not parts[0].endswith('_reels') else None
+        return file_type, course
+
+    @staticmethod
+    def is_indexable(rel_path):
+        parts = rel_path.split('/')
+        if any(part.startswith('.') for part in parts[:-1]):
+            return False
+        return os.path.splitext(parts[-1])[1] in INDEXED_EXTENSIONS
+
+    def _row(self, rel_path, st):
+        file_type, course = self.classify(rel_path)
+        folder, _, name = rel_path.rpartition('/')
+        return (rel_path, name, folder, st.st_size, st.st_mtime_ns, file_type, course)
+
+    def _upsert(self, conn, rows):
+        # Mantém a duração já conhecida se o arquivo não mudou
+        conn.executemany("""
+            INSERT INTO media_files (path, name, folder, size, mtime_ns, type, course)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns,
+                type = excluded.type,
+                course = excluded.course,
+                duration = CASE WHEN media_files.size = excluded.size
+                                 AND media_files.mtime_ns = excluded.mtime_ns
+                                THEN media_files.duration ELSE NULL END
+        """, rows)
+
+    def update_paths(self, paths):
+        """Atualiza (ou remove) do índice arquivos escritos pela aplicação"""
+        rows = []
+        removed = []
+        for path in paths:
+            if not path:
+                continue
+            try:
+                rel_path = self.relative(path)
+            except ValueError:
+                continue
+            if not self.is_indexable(rel_path):
+                continue
+            try:
+                rows.append(self._row(rel_path, os.stat(path)))
+            except FileNotFoundError:
+                removed.append((rel_path,))
+        conn = get_state_db()
+        with conn:
+            self._upsert(conn, rows)
+            conn.executemany('DELETE FROM media_files WHERE path = ?', removed)
+        self._notify([row[0] for row in rows] + [row[0] for row in removed])
+
+    def set_duration(self, path, duration):
+        try:
+            rel_path = self.relative(path)
+        except ValueError:
+            return
+        conn = get_state_db()
+        with conn:
+            conn.execute('UPDATE media_files SET duration = ? WHERE path = ?', (duration, rel_path))
+
+    def reconcile(self):
+        """Sincroniza o índice com o disco, gravando apenas o que mudou"""
+        with self._reconcile_lock:
+            self._reconcile()
+
+    def _reconcile(self):
+        conn = get_state_db()
+        known = {
+            row['path']: (row['size'], row['mtime_ns'])
+            for row in conn.execute('SELECT path, size, mtime_ns FROM media_files')
+        }
+        changed = []
+        seen = set()
+        root = str(self.root)
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            rel_dir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+            for filename in filenames:
+                if os.path.splitext(filename)[1] not in INDEXED_EXTENSIONS:
+                    continue
+                rel_path = filename if rel_dir == '.' else f"{rel_dir}/{filename}"
+                try:
+                    st = os.stat(os.path.join(dirpath, filename))
+                except FileNotFoundError:
+                    continue
+                seen.add(rel_path)
+                if known.get(rel_path) != (st.st_size, st.st_mtime_ns):
+                    changed.append(self._row(rel_path, st))
+        removed = [(path,) for path in known if path not in seen]
+        with conn:
+            self._upsert(conn, changed)
+            conn.executemany('DELETE FROM media_files WHERE path = ?', removed)
+        self.last_reconcile = time.time()
+        if changed or removed:
+            print(f"Índice de mídia: {len(changed)} arquivo(s) atualizado(s), {len(removed)} removido(s)")
+        self._notify(None)
+
+    def _notify(self, rel_paths):
+        if rel_paths is not None and not rel_paths:
+            return
+        for listener in self.listeners:
+            try:
+                listener(rel_paths)
+            except Exception as e:
+                print(f"Erro ao propagar alterações do índice de mídia: {e}")
+
+    def ensure_fresh(self):
+        """Reconcilia na primeira consulta e dispara reconciliação periódica em segundo plano"""
+        if not self.last_reconcile:
+            # Aguarda a reconciliação de inicialização, se ainda estiver rodando
+            with self._reconcile_lock:
+                if not self.last_reconcile:
+                    self._reconcile()
+        elif time.time() - self.last_reconcile > MEDIA_INDEX_RECONCILE_SECONDS and not self._reconcile_lock.locked():
+            self.last_reconcile = time.time()
+            threading.Thread(target=self.reconcile, name='media-index-reconcile', daemon=True).start()
+
+    def find(self, filename, extensions):
+        """Localiza um arquivo pelo nome (ou caminho relativo final) consultando o índice"""
+        self.ensure_fresh()
+        name = filename.replace('\\', '/').rsplit('/', 1)[-1]
+        rows = get_state_db().execute(
+            'SELECT path FROM media_files WHERE name = ? ORDER BY length(path)', (name,)
+        ).fetchall()
+        for row in rows:
+            rel_path = row['path']
+            if rel_path != filename and not rel_path.endswith('/' + filename):
+                continue
+            path = self.root / rel_path
+            if path.suffix not in extensions:
+                continue
+            if path.is_file():
+                return path
+            self.update_paths([path])
+        # Arquivo criado fora da aplicação desde a última reconciliação: só o caminho exato é
+        # conferido, sem percorrer a pasta (o resto fica para a reconciliação periódica)
+        path = self.root / filename.replace('\\', '/')
+        try:
+            self.relative(path)
+        except ValueError:
+            return None
+        if path.suffix in extensions and path.is_file():
+            self.update_paths([path])
+            return path
+        return None
+
+    def list_files(self, max_depth=None):
+        """Lista arquivos indexados (max_depth=2 limita à raiz e subpastas diretas)"""
+        self.ensure_fresh()
+        query = 'SELECT * FROM media_files'
+        if max_depth == 1:
+            query += " WHERE folder = ''"
+        elif max_depth == 2:
+            query += " WHERE instr(folder, '/') = 0"
+        query += " ORDER BY folder != '', folder, name"
+        return get_state_db().execute(query).fetchall()
+
+# Os processos do pool de transcrição paralela (spawn) reimportam o script principal como
+# __mp_main__; nesse caso o módulo só define as funções, sem tarefas de fundo
+BACKGROUND_TASKS = __name__ != '__mp_main__'
+
+media_index = MediaIndex(DOWNLOAD_FOLDER)
+# Reconcilia o índice com o disco ao iniciar, sem atrasar o boot do worker
+if BACKGROUND_TASKS:
+    threading.Thread(target=media_index.reconcile, name='media-index-reconcile', daemon=True).start()
+
+# Cache de modelos Whisper compartilhado entre requisições
+WHISPER_MEMORY_BUDGET_MB = int(os.getenv('WHISPER_MEMORY_BUDGET_MB', '2048'))
+WHISPER_PRELOAD = [m.strip() for m in os.getenv('WHISPER_PRELOAD', '').split(',') if m.strip()]
+# Estimativa de memória (parâmetros em float32) usada antes do carregamento
+WHISPER_MODEL_ESTIMATES_MB = {
+    'tiny': 160, 'base': 300, 'small': 980, 'medium': 3100,
+    'large': 6200, 'large-v1': 6200, 'large-v2': 6200, 'large-v3': 6200, 'turbo': 3300,
+}
+
+class WhisperModelRegistry:
+    """Mantém modelos Whisper carregados entre requisições com despejo LRU por memória"""
+
+    def __init__(self, budget_mb):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self._models = OrderedDict()  # model_size -> (modelo, bytes)
+        self._reserved = {}  # nome -> bytes de modelos carregados fora do cache
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_size):
+        """Retorna o modelo do cache ou carrega, despejando os menos usados se preciso"""
+        with self._lock:
+            if model_size in self._models:
+                self._models.move_to_end(model_size)
+                self.hits += 1
+                return self._models[model_size][0]
+            load_lock = self._load_locks.setdefault(model_size, threading.Lock())
+
+        # Um único carregamento por tamanho; outras threads esperam e reutilizam
+        with load_lock:
+            with self._lock:
+                if model_size in self._models:
+                    self._models.move_to_end(model_size)
+                    self.hits += 1
+                    return self._models[model_size][0]
+                self.misses += 1
+                estimate = WHISPER_MODEL_ESTIMATES_MB.get(model_size, 1000) * 1024 * 1024
+                self._evict(estimate)
+            gc.collect()
+
+            print(f"Carregando modelo Whisper: {model_size}")
+            model = whisper.load_model(model_size)
+            size_bytes = self._model_bytes(model) or estimate
+
+            with self._lock:
+                self._evict(size_bytes)
+                self._models[model_size] = (model, size_bytes)
+            return model
+
+    def reserve(self, name, size_bytes):
+        """Reserva parte do orçamento para modelos fora do cache, despejando os LRU se preciso"""
+        with self._lock:
+            self._reserved.pop(name, None)
+            self._evict(size_bytes)
+            self._reserved[name] = size_bytes
+        gc.collect()
+
+    def release(self, name):
+        """Devolve ao orçamento a memória reservada com reserve"""
+        with self._lock:
+            self._reserved.pop(name, None)
+
+    def _evict(self, incoming_bytes):
+        """Despeja modelos LRU até caber incoming_bytes no orçamento (chamar com lock)"""
+        used = sum(size for _, size in self._models.values()) + sum(self._reserved.values())
+        while self._models and used + incoming_bytes > self.budget_bytes:
+            evicted_size, (_, evicted_bytes) = self._models.popitem(last=False)
+            used -= evicted_bytes
+            self.evictions += 1
+            print(f"Descarregando modelo Whisper: {evicted_size}")
+
+    @staticmethod
+    def _model_bytes(model):
+        try:
+            tensors = list(model.parameters()) + list(model.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'loaded': [
+                    {'model': name, 'memory_mb': round(size / (1024 * 1024), 1)}
+                    for name, (_, size) in self._models.items()
+                ],
+                'reserved': [
+                    {'name': name, 'memory_mb': round(size / (1024 * 1024), 1)}
+                    for name, size in self._reserved.items()
+                ],
+                'used_mb': round((sum(size for _, size in self._models.values())
+                                  + sum(self._reserved.values())) / (1024 * 1024), 1),
+                'budget_mb': round(self.budget_bytes / (1024 * 1024), 1),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+whisper_models = WhisperModelRegistry(WHISPER_MEMORY_BUDGET_MB)
+
+def preload_whisper_models():
+    """Carrega em segundo plano os modelos listados em WHISPER_PRELOAD"""
+    for model_size in WHISPER_PRELOAD:
+        try:
+            whisper_models.get(model_size)
+        except Exception as e:
+            print(f"Erro ao pré-carregar modelo Whisper {model_size}: {e}")
+
+# Com o serviço de transcrição no ar (iniciado pelo gunicorn.conf.py), os modelos ficam só nele
+if BACKGROUND_TASKS and WHISPER_PRELOAD and not os.getenv('TRANSCRIPTION_SERVICE_MANAGED'):
+    threading.Thread(target=preload_whisper_models, name='whisper-preload', daemon=True).start()
+
+# Fila de downloads em segundo plano
+# Cada worker do gunicorn tem seu próprio pool limitado. O estado de cada job também
+# é gravado em disco para que qualquer worker consiga responder /api/jobs/<id>.
+DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', '2'))
+DOWNLOAD_QUEUE_SIZE = int(os.getenv('DOWNLOAD_QUEUE_SIZE', '10'))
+JOB_TTL_SECONDS = int(os.getenv('JOB_TTL_SECONDS', str(24 * 3600)))
+JOB_SAVE_INTERVAL = 1.0  # Intervalo mínimo entre gravações de progresso
+JOBS_FOLDER = STATE_FOLDER / "jobs"
+JOBS_FOLDER.mkdir(exist_ok=True)
+
+download_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix='download')
+jobs = {}
+jobs_lock = threading.Lock()
+
+def save_job(job):
+    """Grava o estado público do job em disco (escrita atômica)"""
+    job_file = JOBS_FOLDER / f"{job['id']}.json"
+    # Entradas de uma playlist baixam em paralelo e salvam o mesmo job: as gravações são
+    # serializadas por job e cada uma usa seu próprio temporário
+    tmp_file = job_file.with_suffix(f'.{threading.get_ident()}.tmp')
+    with job['_save_lock']:
+        with jobs_lock:
+            payload = {k: v for k, v in job.items() if not k.startswith('_')}
+        tmp_file.write_text(json.dumps(payload, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_file, job_file)
+
+def load_job(job_id):
+    """Retorna o estado do job (memória local ou disco)"""
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id or ''):
+        return None
+    with jobs_lock:
+        job = jobs.get(job_id)
+        if job:
+            return {k: v for k, v in job.items() if not k.startswith('_')}
+    job_file = JOBS_FOLDER / f"{job_id}.json"
+    try:
+        return json.loads(job_file.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+def prune_jobs():
+    """Remove jobs finalizados mais antigos que JOB_TTL_SECONDS"""
+    cutoff = time.time() - JOB_TTL_SECONDS
+    with jobs_lock:
+        for job_id in [j for j, job in jobs.items() if job['status'] in ('done', 'error') and job['updated_at'] < cutoff]:
+            del jobs[job_id]
+    for job_file in JOBS_FOLDER.glob('*.json'):
+        try:
+            if job_file.stat().st_mtime < cutoff:
+                job_file.unlink()
+        except OSError:
+            pass
+
+def make_progress_hook(job):
+    """Cria um progress hook do yt-dlp que atualiza o job
+
+    O progresso é acompanhado por arquivo e agregado, o que funciona tanto para
+    downloads sequenciais quanto para vários vídeos de uma playlist em paralelo.
+    """
+    def update(d):
+        with jobs_lock:
+            status = d.get('status')
+            filename = d.get('filename', '')
+            progress = job['_files'].setdefault(filename, {
+                'downloaded': 0, 'total': None, 'speed': None, 'eta': None, 'finished': False
+            })
+            downloaded = d.get('downloaded_bytes') or 0
+            if status == 'downloading':
+                job['current_file'] = os.path.basename(filename)
+                progress['downloaded'] = downloaded
+                progress['total'] = d.get('total_bytes') or d.get('total_bytes_estimate')
+                progress['speed'] = d.get('speed')
+                progress['eta'] = d.get('eta')
+                info = d.get('info_dict') or {}
+                if info.get('playlist_index'):
+                    job['playlist_index'] = info.get('playlist_index')
+                    job['playlist_count'] = info.get('n_entries')
+            elif status == 'finished' and not progress['finished']:
+                progress['downloaded'] = d.get('total_bytes') or downloaded
+                progress['total'] = progress['downloaded']
+                progress['speed'] = None
+                progress['eta'] = None
+                progress['finished'] = True
+                job['files_finished'] += 1
+            files = job['_files'].values()
+            active = [f for f in files if not f['finished']]
+            job['downloaded_bytes'] = sum(f['downloaded'] for f in files)
+            totals = [f['total'] for f in files]
+            job['total_bytes'] = sum(totals) if all(totals) else None
+            speeds = [f['speed'] for f in active if f['speed']]
+            job['speed'] = sum(speeds) if speeds else None
+            etas = [f['eta'] for f in active if f['eta'] is not None]
+            job['eta'] = max(etas) if etas else None
+            job['updated_at'] = time.time()
+            should_save = status == 'finished' or job['updated_at'] - job['_saved_at'] >= JOB_SAVE_INTERVAL
+            if should_save:
+                job['_saved_at'] = job['updated_at']
+        if should_save:
+            save_job(job)
+
+    def hook(d):
+        # Exceções no hook abortariam o download no yt-dlp; o progresso é só informativo
+        try:
+            update(d)
+        except Exception as e:
+            print(f"Erro ao atualizar progresso do job {job['id']}: {e}")
+    return hook
+
+def run_download_job(job, url, quality, is_playlist, download_subtitles, info=None):
+    """Executa o download de um job dentro do pool"""
+    with jobs_lock:
+        job['status'] = 'running'
+        job['started_at'] = job['updated_at'] = time.time()
+    save_job(job)
+    try:
+        result = download_video(url, quality, is_playlist, download_subtitles,
+                                progress_hook=make_progress_hook(job), info=info)
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+    with jobs_lock:
+        job['status'] = 'done' if result.get('success') else 'error'
+        job['result'] = result
+        job['error'] = None if result.get('success') else result.get('error')
+        job['speed'] = None
+        job['eta'] = None
+        job['finished_at'] = job['updated_at'] = time.time()
+    save_job(job)
+
+def submit_download_job(url, quality, is_playlist, download_subtitles, info=None):
+    """Enfileira um download e retorna o job, ou None se a fila estiver cheia"""
+    prune_jobs()
+    now = time.time()
+    with jobs_lock:
+        active = sum(1 for j in jobs.values() if j['status'] in ('queued', 'running'))
+        if active >= DOWNLOAD_WORKERS + DOWNLOAD_QUEUE_SIZE:
+            return None
+        job = {
+            'id': uuid.uuid4().hex,
+            'url': url,
+            'status': 'queued',
+            'is_playlist': is_playlist,
+            'downloaded_bytes': 0,
+            'total_bytes': None,
+            'speed': None,
+            'eta': None,
+            'current_file': None,
+            'files_finished': 0,
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now,
+            '_files': {},
+            '_saved_at': 0,
+            '_save_lock': threading.Lock(),
+        }
+        jobs[job['id']] = job
+    save_job(job)
+    download_executor.submit(run_download_job, job, url, quality, is_playlist, download_subtitles, info)
+    return job
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -383,6 +1628,16 @@ def get_info():
         if not url:
             return jsonify({'error': 'URL não fornecida'}), 400
         
+        # Com offset/limit retorna uma página da playlist com metadados completos
+        if 'offset' in data or 'limit' in data:
+            try:
+                offset = int(data.get('offset', 0))
+                limit = int(data.get('limit', 10))
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Paginação inválida'}), 400
+            page = get_playlist_page(url, offset, limit)
+            return jsonify(page)
+        
         info = get_video_info(url)
         return jsonify(info)
     except Exception as e:
@@ -395,33 +1650,172 @@ def download():
     quality = data.get('quality', 'best')
     is_playlist = data.get('is_playlist', False)
     download_subtitles = data.get('download_subtitles', False)
+    info_token = data.get('info_token')
     
     if not url:
         return jsonify({'error': 'URL não fornecida'}), 400
     
     try:
-        result = download_video(url, quality, is_playlist, download_subtitles)
-        
-        if result['success']:
-            return jsonify(result)
-        else:
-            return jsonify(result), 400
+        # Reaproveita a extração do /api/info; token expirado ou de outra URL cai na extração normal
+        info = load_info_token(info_token, url) if info_token else None
+        job = submit_download_job(url, quality, is_playlist, download_subtitles, info)
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'Fila de downloads cheia. Tente novamente em alguns minutos.'
+            }), 503
+        return jsonify({
+            'success': True,
+            'job_id': job['id'],
+            'status': job['status'],
+            'status_url': f"/api/jobs/{job['id']}"
+        }), 202
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
-@app.route('/api/download-file/<path:filename>')
-def download_file(filename):
-    # Suporta arquivos em subpastas (para playlists)
-    file_path = DOWNLOAD_FOLDER / filename
-    # Verifica se o arquivo está dentro da pasta de downloads (segurança)
-    try:
-        file_path.resolve().relative_to(DOWNLOAD_FOLDER.resolve())
-    except ValueError:
-        return jsonify({'error': 'Acesso negado'}), 403
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métricas de todos os workers no formato de texto do Prometheus"""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/strategies')
+def strategies_status():
+    """Mostra o placar das estratégias de cliente e a ordem atual de tentativa"""
+    stats = strategy_scoreboard.snapshot()
+    return jsonify({
+        'success': True,
+        'half_life_seconds': STRATEGY_HALF_LIFE,
+        'strategies': [
+            {
+                'name': strategy['name'],
+                'player_client': strategy['extractor_args']['youtube']['player_client'],
+                'rank': rank,
+                **stats.get(strategy['name'], {'expected_success': 0.5}),
+            }
+            for rank, strategy in enumerate(strategy_scoreboard.order(DOWNLOAD_STRATEGIES), 1)
+        ]
+    })
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """Retorna status e progresso de um job de download"""
+    job = load_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Job não encontrado'}), 404
+    return jsonify({'success': True, **job})
+
+# Entrega de arquivos pelo nginx: prefixo da location interna (vazio = Flask entrega)
+NGINX_ACCEL_REDIRECT = os.getenv('NGINX_ACCEL_REDIRECT', '')
+
+def set_attachment_header(response, filename):
+    """Define o Content-Disposition de download (filename* para nomes não ASCII), como o send_file"""
+    try:
+        filename.encode('ascii')
+        options = {'filename': filename}
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        options = {'filename': simple, 'filename*': f"UTF-8''{quote(filename, safe='!#$&+-.^_`|~')}"}
+    response.headers.set('Content-Disposition', 'attachment', **options)
+
+@app.route('/api/download-file/<path:filename>')
+def download_file(filename):
+    # Suporta arquivos em subpastas (para playlists)
+    file_path = DOWNLOAD_FOLDER / filename
+    # Verifica se o arquivo está dentro da pasta de downloads (segurança)
+    try:
+        relative_path = file_path.resolve().relative_to(DOWNLOAD_FOLDER.resolve())
+    except ValueError:
+        return jsonify({'error': 'Acesso negado'}), 403
+    if relative_path.parts and relative_path.parts[0] == STATE_FOLDER.name:
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    if not file_path.exists() or not file_path.is_file():
+        return jsonify({'error': 'Arquivo não encontrado'}), 404
+    
+    if NGINX_ACCEL_REDIRECT:
+        # O nginx serve o arquivo (com Range/ETag) e libera o worker na hora
+        response = app.response_class(status=200)
+        response.headers['X-Accel-Redirect'] = NGINX_ACCEL_REDIRECT.rstrip('/') + '/' + quote(relative_path.as_posix())
+        set_attachment_header(response, file_path.name)
+        response.headers['Content-Type'] = mimetypes.guess_type(file_path.name)[0] or 'application/octet-stream'
+        return response
+    
+    # Sem nginx: respostas condicionais (ETag/Last-Modified) e parciais (Range/If-Range)
+    return send_file(
+        file_path,
+        as_attachment=True,
+        conditional=True,
+        etag=True,
+        last_modified=file_path.stat().st_mtime,
+        max_age=0
+    )
+
+# Tamanho dos blocos lidos de cada arquivo ao gerar o ZIP em streaming
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+class ZipStreamBuffer:
+    """Destino não pesquisável do zipfile: acumula os bytes escritos até o gerador repassá-los"""
+    def __init__(self):
+        self._chunks = []
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
     
-    if file_path.exists() and file_path.is_file():
-        return send_file(str(file_path), as_attachment=True)
-    return jsonify({'error': 'Arquivo não encontrado'}), 404
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def iter_folder_zip(folder):
+    """Gera um ZIP (sem compressão, ZIP64 quando preciso) da pasta, lendo um bloco por vez"""
+    buffer = ZipStreamBuffer()
+    paths = sorted(p for p in folder.rglob('*') if p.is_file())
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for path in paths:
+            try:
+                zinfo = zipfile.ZipInfo.from_file(path, (Path(folder.name) / path.relative_to(folder)).as_posix(), strict_timestamps=False)
+                source = open(path, 'rb')
+            except OSError as e:
+                print(f"ZIP: ignorando {path}: {e}")
+                continue
+            zinfo.compress_type = zipfile.ZIP_STORED
+            # file_size conhecido antecipadamente faz o zipfile gravar cabeçalhos ZIP64 para arquivos grandes
+            remaining = zinfo.file_size
+            with source, archive.open(zinfo, mode='w') as entry:
+                while remaining > 0:
+                    chunk = source.read(min(ZIP_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    entry.write(chunk)
+                    remaining -= len(chunk)
+                    yield buffer.drain()
+            yield buffer.drain()
+    # Diretório central (e registros ZIP64, se houver) são escritos no close
+    yield buffer.drain()
+
+@app.route('/api/download-folder/<path:folder>')
+def download_folder(folder):
+    """Baixa uma pasta (playlist, curso ou reels) como ZIP gerado em streaming"""
+    folder_path = DOWNLOAD_FOLDER / folder
+    try:
+        relative_path = folder_path.resolve().relative_to(DOWNLOAD_FOLDER.resolve())
+    except ValueError:
+        return jsonify({'error': 'Acesso negado'}), 403
+    if not relative_path.parts or relative_path.parts[0] == STATE_FOLDER.name:
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    if not folder_path.is_dir():
+        return jsonify({'error': 'Pasta não encontrada'}), 404
+    
+    response = app.response_class(stream_with_context(iter_folder_zip(folder_path)), mimetype='application/zip')
+    set_attachment_header(response, f"{folder_path.name}.zip")
+    # Evita que o proxy acumule o ZIP inteiro antes de repassar
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/api/download-subtitles', methods=['POST'])
 def download_subtitles_only():
@@ -437,11 +1831,8 @@ def download_subtitles_only():
         # Encontra o arquivo de vídeo
         video_path = None
         if video_filename:
-            # Procura o arquivo na pasta de downloads
-            for file in DOWNLOAD_FOLDER.rglob(video_filename):
-                if file.is_file() and file.suffix in ['.mp4', '.webm', '.mkv', '.m4a']:
-                    video_path = file
-                    break
+            # Procura o arquivo no índice da pasta de downloads
+            video_path = media_index.find(video_filename, ['.mp4', '.webm', '.mkv', '.m4a'])
         
         if not video_path:
             return jsonify({'error': 'Arquivo de vídeo não encontrado'}), 404
@@ -462,7 +1853,8 @@ def download_subtitles_only():
         }
         
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=True)
+            with metrics.time_stage('subtitle_download'):
+                info = ydl.extract_info(video_url, download=True)
             
             # Verifica se a legenda foi baixada
             downloaded_subtitles = []
@@ -476,6 +1868,7 @@ def download_subtitles_only():
                     })
             
             if downloaded_subtitles:
+                media_index.update_paths([s['path'] for s in downloaded_subtitles])
                 return jsonify({
                     'success': True,
                     'subtitles': downloaded_subtitles,
@@ -502,11 +1895,7 @@ def transcribe_video():
     
     try:
         # Encontra o arquivo de vídeo
-        video_path = None
-        for file in DOWNLOAD_FOLDER.rglob(video_filename):
-            if file.is_file() and file.suffix in ['.mp4', '.webm', '.mkv', '.m4a', '.mp3']:
-                video_path = file
-                break
+        video_path = media_index.find(video_filename, ['.mp4', '.webm', '.mkv', '.m4a', '.mp3'])
         
         if not video_path:
             return jsonify({'error': 'Arquivo de vídeo não encontrado'}), 404
@@ -522,55 +1911,28 @@ def transcribe_video():
                 'text': transcript_path.read_text(encoding='utf-8')[:500] + '...' if transcript_path.stat().st_size > 500 else transcript_path.read_text(encoding='utf-8')
             })
         
-        # Carrega o modelo Whisper
-        print(f"Carregando modelo Whisper: {model_size}")
-        model = whisper.load_model(model_size)
-        
-        # Encontra o ffmpeg
-        ffmpeg_path = shutil.which('ffmpeg')
-        if not ffmpeg_path:
+        if not shutil.which('ffmpeg'):
             return jsonify({
                 'success': False,
                 'error': 'ffmpeg não encontrado. Por favor, instale o ffmpeg.'
             }), 400
         
-        # Extrai áudio do vídeo se necessário
-        audio_path = None
-        if video_path.suffix in ['.mp4', '.webm', '.mkv']:
-            # Precisa extrair áudio
-            audio_path = video_path.parent / f"{video_path.stem}_temp_audio.wav"
-            print(f"Extraindo áudio de {video_path.name}...")
-            result = subprocess.run([
-                ffmpeg_path, '-i', str(video_path),
-                '-ar', '16000',  # Taxa de amostragem para Whisper
-                '-ac', '1',  # Mono
-                '-y',  # Sobrescrever se existir
-                str(audio_path)
-            ], capture_output=True, check=True)
-        else:
-            # Já é um arquivo de áudio
-            audio_path = video_path
-        
-        # Transcreve o áudio
-        print(f"Transcrevendo {audio_path.name}...")
-        result = model.transcribe(
-            str(audio_path),
-            language='pt',  # Português
-            task='transcribe'
-        )
-        
-        # Salva a transcrição em texto
-        transcript_text = result['text']
-        transcript_path.write_text(transcript_text, encoding='utf-8')
-        
-        # Salva também em formato VTT para uso com timeline
-        vtt_path = video_path.parent / f"{video_path.stem}.pt.vtt"
-        whisper_result_to_vtt(result, vtt_path)
+        # Transcreve no serviço dedicado (um modelo para todos os workers) e salva TXT + VTT
+        summary = None
+        for _, summary, error in transcribe_videos([video_path], model_size):
+            if error:
+                return jsonify({
+                    'success': False,
+                    'error': error
+                }), 400
         
-        # Remove arquivo temporário de áudio se foi criado
-        if audio_path != video_path and audio_path.exists():
-            audio_path.unlink()
+        if summary is None:
+            return jsonify({
+                'success': False,
+                'error': 'A transcrição terminou sem retornar resultado'
+            }), 400
         
+        vtt_path = Path(summary['vtt_path'])
         return jsonify({
             'success': True,
             'message': 'Transcrição concluída',
@@ -578,53 +1940,36 @@ def transcribe_video():
             'vtt_filename': vtt_path.name,
             'path': str(transcript_path),
             'vtt_path': str(vtt_path),
-            'text': transcript_text[:1000] + '...' if len(transcript_text) > 1000 else transcript_text,
-            'full_length': len(transcript_text)
+            'text': summary['text'] + '...' if summary['full_length'] > 1000 else summary['text'],
+            'full_length': summary['full_length']
         })
         
-    except subprocess.CalledProcessError as e:
-        return jsonify({
-            'success': False,
-            'error': f'Erro ao extrair áudio: {e.stderr.decode() if e.stderr else str(e)}'
-        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 400
 
+@app.route('/api/whisper-models')
+def whisper_models_status():
+    """Retorna modelos Whisper carregados e estatísticas do cache (do serviço de transcrição, se no ar)"""
+    stats = transcription_service_stats()
+    if stats is not None:
+        return jsonify({'success': True, 'service': True, **stats})
+    return jsonify({'success': True, 'service': False, **whisper_models.stats()})
+
 @app.route('/api/list-downloads')
 def list_downloads():
     """Lista todos os vídeos e transcrições baixados"""
     files = []
-    # Lista arquivos na pasta principal
-    for file in DOWNLOAD_FOLDER.iterdir():
-        if file.is_file() and file.suffix in ['.mp4', '.webm', '.mkv', '.m4a', '.mp3', '.vtt', '.txt']:
-            file_type = 'subtitle' if file.suffix == '.vtt' else ('transcript' if file.suffix == '.txt' and '_whisper' in file.name else 'video')
-            files.append({
-                'name': file.name,
-                'size': file.stat().st_size,
-                'path': str(file),
-                'type': file_type
-            })
-    
-    # Lista arquivos em subpastas (playlists e reels)
-    for subfolder in DOWNLOAD_FOLDER.iterdir():
-        if subfolder.is_dir():
-            # Se for pasta de reels, marca como reel
-            is_reels_folder = subfolder.name.endswith('_reels')
-            for file in subfolder.iterdir():
-                if file.is_file() and file.suffix in ['.mp4', '.webm', '.mkv', '.m4a', '.mp3', '.vtt', '.txt']:
-                    if is_reels_folder:
-                        file_type = 'reel'
-                    else:
-                        file_type = 'subtitle' if file.suffix == '.vtt' else ('transcript' if file.suffix == '.txt' and '_whisper' in file.name else 'video')
-                    files.append({
-                        'name': f"{subfolder.name}/{file.name}",
-                        'size': file.stat().st_size,
-                        'path': str(file),
-                        'type': file_type
-                    })
+    # Pasta principal e subpastas diretas (playlists e reels), a partir do índice
+    for row in media_index.list_files(max_depth=2):
+        files.append({
+            'name': row['path'],
+            'size': row['size'],
+            'path': str(DOWNLOAD_FOLDER / row['path']),
+            'type': row['type']
+        })
     
     return jsonify({'files': files})
 
@@ -655,6 +2000,67 @@ def course_videos():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+# Linha do tempo paginada: tamanho padrão/máximo da página e limites do modo overview
+TIMELINE_PAGE_SIZE = 200
+TIMELINE_PAGE_MAX = 1000
+TIMELINE_OVERVIEW_MAX_BUCKETS = 500
+
+class TimelineIndex:
+    """Segmentos ordenados por início, com busca binária por intervalo de tempo"""
+
+    def __init__(self, segments):
+        self.segments = sorted(segments, key=lambda seg: seg['start'])
+        self.starts = [seg['start'] for seg in self.segments]
+        # Maior fim até cada posição: permite achar o primeiro segmento que termina depois de t
+        self.max_ends = list(itertools.accumulate((seg['end'] for seg in self.segments), max))
+
+    def __len__(self):
+        return len(self.segments)
+
+    def range(self, start=None, end=None):
+        """Retorna (primeiro, último+1) dos índices dos segmentos que se sobrepõem a [start, end)"""
+        lo = 0 if start is None else bisect.bisect_right(self.max_ends, start)
+        hi = len(self.segments) if end is None else bisect.bisect_left(self.starts, end)
+        return lo, max(lo, hi)
+
+# Índices recentes por legenda; a chave inclui mtime/tamanho, então legendas novas geram outro índice
+timeline_cache = CoalescingTTLCache(600, 16)
+
+def get_timeline_index(subtitle_path):
+    stat = subtitle_path.stat()
+    key = (str(subtitle_path.resolve()), stat.st_mtime_ns, stat.st_size)
+    return timeline_cache.get_or_compute(key, lambda: TimelineIndex(parse_vtt_file(subtitle_path)))
+
+def format_timeline_segment(start, end, text):
+    return {
+        'start_seconds': round(start, 2),
+        'end_seconds': round(end, 2),
+        'start': seconds_to_hhmmss(start),
+        'end': seconds_to_hhmmss(end),
+        'text': text
+    }
+
+def compressed_jsonify(payload):
+    """jsonify com gzip quando o cliente aceita e a resposta é grande o bastante para valer a pena"""
+    response = jsonify(payload)
+    response.headers['Vary'] = 'Accept-Encoding'
+    if 'gzip' not in request.headers.get('Accept-Encoding', '').lower():
+        return response
+    body = response.get_data()
+    if len(body) < 1024:
+        return response
+    response.set_data(gzip.compress(body, compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def optional_seconds(value):
+    """Converte segundos ou hh:mm:ss em float, mantendo None"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return hhmmss_to_seconds(str(value))
+
 @app.route('/api/video-timeline', methods=['POST'])
 def video_timeline():
     data = request.get_json()
@@ -670,33 +2076,109 @@ def video_timeline():
                 'success': False,
                 'error': 'Nenhum arquivo de legenda encontrado para este vídeo. Baixe ou transcreva primeiro.'
             }), 404
-        segments = parse_vtt_file(subtitle_path)
-        if not segments:
+        index = get_timeline_index(subtitle_path)
+        if not len(index):
             return jsonify({
                 'success': False,
                 'error': 'Não foi possível extrair a transcrição para gerar a linha do tempo.'
             }), 400
-        formatted_segments = [
-            {
-                'start_seconds': round(seg['start'], 2),
-                'end_seconds': round(seg['end'], 2),
-                'start': seconds_to_hhmmss(seg['start']),
-                'end': seconds_to_hhmmss(seg['end']),
-                'text': seg['text']
-            }
-            for seg in segments
-        ]
-        return jsonify({
+        
+        # Intervalo opcional (segundos ou hh:mm:ss) e cursor = índice do próximo segmento
+        range_start = optional_seconds(data.get('start'))
+        range_end = optional_seconds(data.get('end'))
+        lo, hi = index.range(range_start, range_end)
+        result = {
             'success': True,
-            'segments': formatted_segments,
             'subtitle': subtitle_path.name,
-            'duration': get_video_duration(video_path)
-        })
+            'duration': get_video_duration(video_path),
+            'total': len(index)
+        }
+        
+        if data.get('level') == 'overview':
+            # Agrupa os segmentos em baldes de tamanho fixo (cursor aponta o primeiro segmento do balde)
+            first = index.segments[lo]['start'] if lo < hi else 0
+            last = index.max_ends[hi - 1] if lo < hi else 0
+            bucket_seconds = max(float(data.get('bucket_seconds') or 60),
+                                 (last - first) / TIMELINE_OVERVIEW_MAX_BUCKETS, 1)
+            buckets = []
+            for position in range(lo, hi):
+                seg = index.segments[position]
+                if range_start is not None and seg['end'] <= range_start:
+                    continue
+                bucket_start = first + ((seg['start'] - first) // bucket_seconds) * bucket_seconds
+                if not buckets or buckets[-1]['bucket_start'] != bucket_start:
+                    buckets.append({'bucket_start': bucket_start, 'end': seg['end'], 'texts': [], 'cursor': position, 'count': 0})
+                bucket = buckets[-1]
+                bucket['end'] = max(bucket['end'], seg['end'])
+                bucket['count'] += 1
+                if sum(len(t) for t in bucket['texts']) < 200:
+                    bucket['texts'].append(seg['text'])
+            result['level'] = 'overview'
+            result['bucket_seconds'] = bucket_seconds
+            result['buckets'] = [
+                {
+                    **format_timeline_segment(bucket['bucket_start'], bucket['end'], ' '.join(bucket['texts'])[:200]),
+                    'cursor': bucket['cursor'],
+                    'segment_count': bucket['count']
+                }
+                for bucket in buckets
+            ]
+            return compressed_jsonify(result)
+        
+        limit = max(1, min(int(data.get('limit') or TIMELINE_PAGE_SIZE), TIMELINE_PAGE_MAX))
+        position = max(lo, int(data.get('cursor') or 0))
+        formatted_segments = []
+        while position < hi and len(formatted_segments) < limit:
+            seg = index.segments[position]
+            position += 1
+            # Com segmentos sobrepostos, alguns antes de hi podem terminar antes do início pedido
+            if range_start is not None and seg['end'] <= range_start:
+                continue
+            formatted_segments.append({**format_timeline_segment(seg['start'], seg['end'], seg['text']), 'cursor': position - 1})
+        result['segments'] = formatted_segments
+        result['next_cursor'] = position if position < hi else None
+        return compressed_jsonify(result)
     except (ValueError, FileNotFoundError) as e:
         return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': f'Erro ao gerar linha do tempo: {e}'}), 400
 
+SEARCH_PAGE_MAX = 100
+
+@app.route('/api/search')
+def search_transcripts():
+    """Busca textual em todas as legendas, com o trecho e o tempo (ms) de cada ocorrência"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'Informe o termo de busca'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), SEARCH_PAGE_MAX))
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Paginação inválida'}), 400
+    media_index.ensure_fresh()
+    total, rows = transcript_index.search(query, limit, offset)
+    return compressed_jsonify({
+        'success': True,
+        'query': query,
+        'total': total,
+        'results': [
+            {
+                'course': row['course'],
+                'video': row['video'],
+                'subtitle': row['path'],
+                'start_ms': row['start_ms'],
+                'end_ms': row['end_ms'],
+                'start': seconds_to_hhmmss(row['start_ms'] / 1000),
+                'end': seconds_to_hhmmss(row['end_ms'] / 1000),
+                'text': row['text'],
+                'snippet': TranscriptIndex.highlight(row['snippet']),
+                'score': round(-row['rank'], 4)
+            }
+            for row in rows
+        ]
+    })
+
 @app.route('/api/create-lessons', methods=['POST'])
 def create_lessons():
     data = request.get_json()
@@ -714,12 +2196,9 @@ def create_lessons():
         course_path, video_path = resolve_video_path(course_name, filename)
         lessons_folder = course_path / LESSONS_FOLDER_NAME
         lessons_folder.mkdir(exist_ok=True)
-        existing_count = len([
-            f for f in lessons_folder.glob('*')
-            if f.is_file() and f.suffix in VIDEO_EXTENSIONS
-        ])
-        sequence = existing_count + 1
-        created_lessons = []
+        sequence = next_lesson_sequence(lessons_folder)
+        # Valida todas as aulas antes de iniciar os cortes
+        planned_lessons = []
         for lesson in lessons:
             title = lesson.get('title', f'Aula {sequence}')
             start = lesson.get('start')
@@ -734,31 +2213,42 @@ def create_lessons():
             safe_title = sanitize_filename(title)
             output_filename = f"{sequence:02d} - {safe_title}{video_path.suffix}"
             clip_path = lessons_folder / output_filename
-            cmd = [
-                ffmpeg_path,
-                '-ss', str(start_seconds),
-                '-i', str(video_path),
-                '-t', str(duration),
-                '-c', 'copy',
-                '-avoid_negative_ts', 'make_zero',
-                '-y',
-                str(clip_path)
-            ]
-            try:
-                subprocess.run(cmd, capture_output=True, check=True)
-            except subprocess.CalledProcessError as e:
-                raise RuntimeError(f'Erro ao criar aula "{title}": {e.stderr.decode() if e.stderr else str(e)}')
-            created_lessons.append({
+            planned_lessons.append(({
                 'title': title,
                 'filename': output_filename,
                 'duration': duration
-            })
+            }, (start_seconds, duration, clip_path)))
             sequence += 1
+        
+        # Todos os cortes saem do mesmo ffmpeg; um erro numa aula não interrompe as demais
+        created_lessons = []
+        errors = []
+        cut_errors = cut_segments(video_path, [cut for _, cut in planned_lessons], ffmpeg_path)
+        for (lesson_info, _), error in zip(planned_lessons, cut_errors):
+            if error:
+                errors.append({
+                    'title': lesson_info['title'],
+                    'error': f'Erro ao criar aula "{lesson_info["title"]}": {error}'
+                })
+            else:
+                created_lessons.append(lesson_info)
+        media_index.update_paths([lessons_folder / lesson['filename'] for lesson in created_lessons])
+        metrics.inc('clips_created_total', len(created_lessons), kind='lesson')
+        if not created_lessons:
+            return jsonify({
+                'success': False,
+                'error': errors[0]['error'] if errors else 'Nenhuma aula criada',
+                'errors': errors
+            }), 400
+        message = f'{len(created_lessons)} aulas criadas em "{LESSONS_FOLDER_NAME}"'
+        if errors:
+            message += f' ({len(errors)} com erro)'
         return jsonify({
             'success': True,
-            'message': f'{len(created_lessons)} aulas criadas em "{LESSONS_FOLDER_NAME}"',
+            'message': message,
             'lessons_folder': LESSONS_FOLDER_NAME,
-            'created': created_lessons
+            'created': created_lessons,
+            'errors': errors
         })
     except (ValueError, FileNotFoundError) as e:
         return jsonify({'success': False, 'error': str(e)}), 400
@@ -766,164 +2256,532 @@ def create_lessons():
         return jsonify({'success': False, 'error': f'Erro ao criar aulas: {e}'}), 400
 
 
+# Linha de tempo de um cue VTT (horas opcionais, como permite o formato)
+VTT_TIMING_RE = re.compile(
+    r'^(?:(\d+):)?(\d{2}):(\d{2})[.,](\d{3})\s+-->\s+(?:(\d+):)?(\d{2}):(\d{2})[.,](\d{3})'
+)
+# Tags inline (<c>, <00:00:01.000>, <v Nome>...) removidas do texto
+VTT_TAG_RE = re.compile(r'<[^>]*>')
+# Marcas de tempo por palavra (<00:00:01.200>): só aparecem nas legendas automáticas "rolantes"
+VTT_INLINE_TIMESTAMP_RE = re.compile(r'<(?:\d+:)?\d{2}:\d{2}\.\d{3}>')
+
+# Segmentos já parseados, um JSON por legenda, invalidado pelo mtime/tamanho do VTT
+SEGMENTS_FOLDER = STATE_FOLDER / "segments"
+SEGMENTS_FOLDER.mkdir(exist_ok=True)
+# Incrementar quando o parse mudar, para descartar caches gerados pela versão anterior
+SEGMENTS_CACHE_VERSION = 2
+
+def iter_vtt_segments(lines):
+    """Parseia linhas de um VTT em streaming, descartando as linhas repetidas das legendas automáticas"""
+    timing = None
+    cue_lines = []
+    previous_lines = ()
+    rolling = False
+    # Só uma linha realmente vazia (ou o fim do arquivo) fecha o cue; o YouTube usa linhas com um espaço
+    for line in itertools.chain(lines, ('',)):
+        line = line.rstrip('\r\n')
+        if timing is None:
+            match = VTT_TIMING_RE.match(line.strip()) if '-->' in line else None
+            if match:
+                g = match.groups()
+                start = int(g[0] or 0) * 3600 + int(g[1]) * 60 + int(g[2]) + int(g[3]) / 1000
+                end = int(g[4] or 0) * 3600 + int(g[5]) * 60 + int(g[6]) + int(g[7]) / 1000
+                timing = (start, end)
+            continue
+        if line:
+            text = line
+            if '<' in text:
+                if not rolling and VTT_INLINE_TIMESTAMP_RE.search(text):
+                    rolling = True
+                text = VTT_TAG_RE.sub('', text)
+            if '&' in text:
+                text = html.unescape(text)
+            text = text.strip()
+            if text:
+                cue_lines.append(text)
+            continue
+        # Legendas "rolantes" do YouTube começam repetindo as últimas linhas do cue anterior;
+        # fora delas, linhas repetidas ("sim", refrões) são fala de verdade e ficam
+        overlap = 0
+        if rolling:
+            for size in range(min(len(cue_lines), len(previous_lines)), 0, -1):
+                if tuple(cue_lines[:size]) == previous_lines[-size:]:
+                    overlap = size
+                    break
+        new_lines = cue_lines[overlap:]
+        if cue_lines:
+            previous_lines = tuple(cue_lines)
+        if new_lines:
+            start, end = timing
+            yield {
+                'start': start,
+                'end': end,
+                'text': ' '.join(new_lines),
+                'duration': end - start
+            }
+        timing = None
+        cue_lines = []
+
 def parse_vtt_file(vtt_path):
-    """Parseia um arquivo VTT e retorna lista de segmentos com timestamps"""
-    segments = []
-    with open(vtt_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Regex para capturar timestamps e texto
-    pattern = r'(\d{2}:\d{2}:\d{2}\.\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2}\.\d{3})\s*\n(.*?)(?=\n\d{2}:\d{2}:\d{2}|$)'
-    matches = re.finditer(pattern, content, re.DOTALL | re.MULTILINE)
+    """Parseia um arquivo VTT e retorna lista de segmentos com timestamps (com cache por mtime)"""
+    vtt_path = Path(vtt_path)
+    stat = vtt_path.stat()
+    key = hashlib.sha1(str(vtt_path.resolve()).encode('utf-8')).hexdigest()
+    cache_file = SEGMENTS_FOLDER / f"{key}.json"
+    try:
+        cached = json.loads(cache_file.read_text(encoding='utf-8'))
+        if (cached.get('version') == SEGMENTS_CACHE_VERSION and cached.get('mtime_ns') == stat.st_mtime_ns
+                and cached.get('size') == stat.st_size):
+            return [
+                {'start': start, 'end': end, 'text': text, 'duration': end - start}
+                for start, end, text in cached['segments']
+            ]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
     
-    for match in matches:
-        start_time = match.group(1)
-        end_time = match.group(2)
-        text = match.group(3).strip().replace('\n', ' ')
-        
-        # Converte tempo para segundos
-        def time_to_seconds(time_str):
-            parts = time_str.split(':')
-            hours = int(parts[0])
-            minutes = int(parts[1])
-            seconds = float(parts[2])
-            return hours * 3600 + minutes * 60 + seconds
-        
-        segments.append({
-            'start': time_to_seconds(start_time),
-            'end': time_to_seconds(end_time),
-            'text': text,
-            'duration': time_to_seconds(end_time) - time_to_seconds(start_time)
-        })
+    with open(vtt_path, 'r', encoding='utf-8-sig') as f:
+        segments = list(iter_vtt_segments(f))
     
+    # Formato compacto: [início, fim, texto] por segmento
+    tmp_file = cache_file.with_name(f"{key}.{uuid.uuid4().hex}.tmp")
+    try:
+        tmp_file.write_text(json.dumps({
+            'version': SEGMENTS_CACHE_VERSION,
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'segments': [[seg['start'], seg['end'], seg['text']] for seg in segments]
+        }, ensure_ascii=False, separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"Não foi possível salvar cache de segmentos de {vtt_path.name}: {e}")
     return segments
 
-def analyze_viral_moments(segments, min_duration=15, max_duration=60):
-    """Analisa segmentos e identifica momentos virais usando heurísticas"""
-    viral_keywords = [
-        'incrível', 'surpreendente', 'você sabia', 'dica', 'segredo',
-        'nunca mais', 'pare de', 'como fazer', 'tutorial', 'passo a passo',
-        'atenção', 'importante', 'cuidado', 'alerta', 'não faça',
-        'melhor', 'pior', 'top', 'ranking', 'lista',
-        'mistério', 'revelação', 'descoberta', 'novidade',
-        'truque', 'hack', 'macete', 'jeito fácil',
-        'pergunta', 'resposta', 'explicação', 'entenda',
-        'motivação', 'inspiração', 'sucesso', 'conquista',
-        'erro', 'evite', 'não cometa', 'cuidado com'
-    ]
+# Busca textual nas legendas: segmentos com tempo em ms e índice FTS5 (external content)
+class TranscriptIndex:
+    """Índice FTS5 dos segmentos de todas as legendas, mantido a partir do índice de mídia"""
+
+    # Marcadores do snippet(): caracteres de controle que não aparecem nas legendas, trocados
+    # por <mark> só depois de escapar o texto
+    MARK_START = '\x02'
+    MARK_END = '\x03'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = threading.Event()
+        conn = get_state_db()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS transcript_files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    video TEXT,
+                    course TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS transcript_segments (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    start_ms INTEGER NOT NULL,
+                    end_ms INTEGER NOT NULL,
+                    text TEXT NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS transcript_segments_path ON transcript_segments (path)')
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS transcript_fts USING fts5(
+                    text, content='transcript_segments', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+            # Gatilhos mantêm o FTS em dia com a tabela de segmentos
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS transcript_segments_ai AFTER INSERT ON transcript_segments BEGIN
+                    INSERT INTO transcript_fts (rowid, text) VALUES (new.id, new.text);
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS transcript_segments_ad AFTER DELETE ON transcript_segments BEGIN
+                    INSERT INTO transcript_fts (transcript_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END
+            """)
+
+    def on_media_change(self, rel_paths):
+        """Listener do índice de mídia: só reage a legendas (ou a reconciliações completas)"""
+        if rel_paths is None or any(path.endswith('.vtt') for path in rel_paths):
+            self.sync()
+
+    def sync(self):
+        """Indexa legendas novas ou alteradas e remove as apagadas; chamadas concorrentes viram uma nova rodada"""
+        self._pending.set()
+        while True:
+            if not self._lock.acquire(blocking=False):
+                return
+            try:
+                while self._pending.is_set():
+                    self._pending.clear()
+                    self._sync()
+            finally:
+                self._lock.release()
+            if not self._pending.is_set():
+                return
+
+    def _sync(self):
+        conn = get_state_db()
+        current = {
+            row['path']: (row['size'], row['mtime_ns'])
+            for row in conn.execute("SELECT path, size, mtime_ns FROM media_files WHERE name LIKE '%.vtt'")
+        }
+        indexed = {
+            row['path']: (row['size'], row['mtime_ns'])
+            for row in conn.execute('SELECT path, size, mtime_ns FROM transcript_files')
+        }
+        removed = [path for path in indexed if path not in current]
+        changed = [path for path, version in current.items() if indexed.get(path) != version]
+        with conn:
+            for path in removed:
+                conn.execute('DELETE FROM transcript_segments WHERE path = ?', (path,))
+                conn.execute('DELETE FROM transcript_files WHERE path = ?', (path,))
+        for path in changed:
+            self._index_file(conn, path, *current[path])
+        if changed or removed:
+            print(f"Índice de busca: {len(changed)} legenda(s) indexada(s), {len(removed)} removida(s)")
+
+    def _index_file(self, conn, rel_path, size, mtime_ns):
+        """Reindexa uma legenda numa transação (os segmentos antigos saem pelo gatilho)"""
+        try:
+            segments = parse_vtt_file(DOWNLOAD_FOLDER / rel_path)
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Índice de busca: ignorando {rel_path}: {e}")
+            segments = []
+        folder, _, name = rel_path.rpartition('/')
+        # aula.pt.vtt / aula.vtt -> vídeo "aula.*" na mesma pasta
+        stem = name[:-len('.vtt')]
+        base, dot, lang = stem.rpartition('.')
+        if dot and re.fullmatch(r'[A-Za-z]{2,3}(-[A-Za-z0-9]+)?', lang):
+            stem = base
+        video = conn.execute(
+            "SELECT name FROM media_files WHERE folder = ? AND type = 'video' AND name LIKE ? ESCAPE '\\' "
+            "ORDER BY name LIMIT 1",
+            (folder, re.sub(r'([%_\\])', r'\\\1', stem) + '.%')
+        ).fetchone()
+        with conn:
+            conn.execute('DELETE FROM transcript_segments WHERE path = ?', (rel_path,))
+            conn.executemany(
+                'INSERT INTO transcript_segments (path, start_ms, end_ms, text) VALUES (?, ?, ?, ?)',
+                [(rel_path, round(seg['start'] * 1000), round(seg['end'] * 1000), seg['text']) for seg in segments]
+            )
+            conn.execute("""
+                INSERT INTO transcript_files (path, size, mtime_ns, video, course) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    size = excluded.size, mtime_ns = excluded.mtime_ns,
+                    video = excluded.video, course = excluded.course
+            """, (rel_path, size, mtime_ns, video['name'] if video else None,
+                  folder.split('/')[0] if folder else None))
+
+    @staticmethod
+    def build_query(text):
+        """Transforma o texto digitado numa consulta FTS5 segura (termos entre aspas, último como prefixo)"""
+        terms = re.findall(r'\w+', text)
+        if not terms:
+            return None
+        quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def search(self, text, limit=20, offset=0):
+        """Retorna (total, hits) ordenados por relevância (bm25)"""
+        query = self.build_query(text)
+        if not query:
+            return 0, []
+        conn = get_state_db()
+        total = conn.execute(
+            'SELECT count(*) FROM transcript_fts WHERE transcript_fts MATCH ?', (query,)
+        ).fetchone()[0]
+        rows = conn.execute("""
+            SELECT s.path, s.start_ms, s.end_ms, s.text, f.video, f.course,
+                   snippet(transcript_fts, 0, ?, ?, '…', 16) AS snippet,
+                   bm25(transcript_fts) AS rank
+            FROM transcript_fts
+            JOIN transcript_segments s ON s.id = transcript_fts.rowid
+            JOIN transcript_files f ON f.path = s.path
+            WHERE transcript_fts MATCH ?
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+        """, (self.MARK_START, self.MARK_END, query, limit, offset)).fetchall()
+        return total, rows
+
+    @classmethod
+    def highlight(cls, snippet):
+        """Escapa o trecho para HTML e destaca os termos encontrados com <mark>"""
+        escaped = html.escape(snippet)
+        return escaped.replace(cls.MARK_START, '<mark>').replace(cls.MARK_END, '</mark>')
+
+transcript_index = TranscriptIndex()
+media_index.listeners.append(transcript_index.on_media_change)
+# Indexa legendas existentes (ou alteradas com o serviço parado) sem atrasar o boot
+if BACKGROUND_TASKS:
+    threading.Thread(target=transcript_index.sync, name='transcript-index-sync', daemon=True).start()
+
+VIRAL_KEYWORDS = (
+    'incrível', 'surpreendente', 'você sabia', 'dica', 'segredo',
+    'nunca mais', 'pare de', 'como fazer', 'tutorial', 'passo a passo',
+    'atenção', 'importante', 'cuidado', 'alerta', 'não faça',
+    'melhor', 'pior', 'top', 'ranking', 'lista',
+    'mistério', 'revelação', 'descoberta', 'novidade',
+    'truque', 'hack', 'macete', 'jeito fácil',
+    'pergunta', 'resposta', 'explicação', 'entenda',
+    'motivação', 'inspiração', 'sucesso', 'conquista',
+    'erro', 'evite', 'não cometa', 'cuidado com'
+)
+
+# Palavras que indicam início de tópico importante
+TOPIC_STARTERS = ('olha só', 'sabe o que', 'quer saber', 'vou te mostrar',
+                  'preste atenção', 'escuta isso', 'imagina', 'pensa comigo')
+
+def compile_phrases(phrases):
+    """Compila as frases numa única regex em forma de trie (equivale a testar 'frase in texto' para todas)
+
+    Prefixos comuns são fatorados (ex.: cuidado(?: com)?), então o motor
+    de regex testa cada posição do texto uma vez por ramo, não por frase.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = {}
     
-    # Palavras que indicam início de tópico importante
-    topic_starters = ['olha só', 'sabe o que', 'quer saber', 'vou te mostrar',
-                     'preste atenção', 'escuta isso', 'imagina', 'pensa comigo']
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 and '' not in node else f"(?:{'|'.join(branches)})"
+        return body + ('?' if '' in node else '')
     
-    viral_moments = []
+    return re.compile(build(trie))
+
+VIRAL_KEYWORDS_RE = compile_phrases(VIRAL_KEYWORDS)
+TOPIC_STARTERS_RE = compile_phrases(TOPIC_STARTERS)
+
+def score_segment(segment):
+    """Calcula a pontuação de viralidade de um segmento, com uma busca por grupo de frases"""
+    text = segment['text']
+    text_lower = text.lower()
+    has_viral_keyword = VIRAL_KEYWORDS_RE.search(text_lower) is not None
+    has_topic_starter = TOPIC_STARTERS_RE.search(text_lower) is not None
     
-    # Agrupa segmentos consecutivos
-    current_group = []
-    current_start = None
-    current_text = []
+    score = 0
+    if has_viral_keyword:
+        score += 2
+    if has_topic_starter:
+        score += 3
+    if '?' in text:  # Perguntas são engajadoras
+        score += 1
+    if len(text) > 50:  # Conteúdo mais completo
+        score += 1
+    if segment['duration'] > 3:  # Momento mais longo pode ser importante
+        score += 1
     
-    for i, segment in enumerate(segments):
-        text_lower = segment['text'].lower()
-        
-        # Verifica se tem palavras-chave virais
-        has_viral_keyword = any(keyword in text_lower for keyword in viral_keywords)
-        has_topic_starter = any(starter in text_lower for starter in topic_starters)
-        
-        # Pontuação de viralidade
-        score = 0
-        if has_viral_keyword:
-            score += 2
-        if has_topic_starter:
-            score += 3
-        if '?' in segment['text']:  # Perguntas são engajadoras
-            score += 1
-        if len(segment['text']) > 50:  # Conteúdo mais completo
-            score += 1
-        if segment['duration'] > 3:  # Momento mais longo pode ser importante
-            score += 1
-        
-        # Se tem pontuação alta ou é início de tópico, adiciona ao grupo
-        if score >= 2 or has_topic_starter:
-            if current_start is None:
-                current_start = segment['start']
-            current_group.append(segment)
-            current_text.append(segment['text'])
-        else:
-            # Finaliza grupo se tiver duração adequada
-            if current_group and current_start is not None:
-                group_duration = current_group[-1]['end'] - current_start
-                if min_duration <= group_duration <= max_duration:
-                    viral_moments.append({
-                        'start': current_start,
-                        'end': current_group[-1]['end'],
-                        'duration': group_duration,
-                        'text': ' '.join(current_text),
-                        'score': sum(1 for s in current_group if any(kw in s['text'].lower() for kw in viral_keywords))
-                    })
-            current_group = []
-            current_start = None
-            current_text = []
+    # Só segmentos com pontuação alta ou início de tópico contam para o momento
+    if score >= 2 or has_topic_starter:
+        return score
+    return 0
+
+def analyze_viral_moments(segments, min_duration=15, max_duration=60):
+    """Analisa segmentos e identifica momentos virais usando heurísticas
+
+    Cada segmento é pontuado uma vez; com somas de prefixo e dois ponteiros,
+    cada segmento relevante abre a janela de maior pontuação que cabe entre
+    min_duration e max_duration. As melhores janelas sem sobreposição são
+    escolhidas em seguida.
+    """
+    segments = sorted(segments, key=lambda seg: seg['start'])
+    count = len(segments)
+    scores = [score_segment(seg) for seg in segments]
     
-    # Finaliza último grupo se existir
-    if current_group and current_start is not None:
-        group_duration = current_group[-1]['end'] - current_start
-        if min_duration <= group_duration <= max_duration:
-            viral_moments.append({
-                'start': current_start,
-                'end': current_group[-1]['end'],
-                'duration': group_duration,
-                'text': ' '.join(current_text),
-                'score': sum(1 for s in current_group if any(kw in s['text'].lower() for kw in viral_keywords))
-            })
+    prefix = [0] * (count + 1)
+    last_relevant = [-1] * count
+    for i, score in enumerate(scores):
+        prefix[i + 1] = prefix[i] + score
+        last_relevant[i] = i if score else (last_relevant[i - 1] if i else -1)
     
-    # Ordena por score e retorna top momentos
-    viral_moments.sort(key=lambda x: x['score'], reverse=True)
-    return viral_moments[:10]  # Retorna top 10 momentos
+    candidates = []
+    end = 0        # Último segmento que cabe em max_duration a partir do início
+    min_end = 0    # Primeiro segmento que atinge min_duration a partir do início
+    for start_index, segment in enumerate(segments):
+        start = segment['start']
+        end = max(end, start_index)
+        min_end = max(min_end, start_index)
+        while end + 1 < count and segments[end + 1]['end'] - start <= max_duration:
+            end += 1
+        while min_end < end and segments[min_end]['end'] - start < min_duration:
+            min_end += 1
+        if not scores[start_index] or segments[end]['end'] - start > max_duration:
+            continue
+        # A janela termina no último segmento relevante, estendida se preciso até min_duration
+        window_end = max(last_relevant[end], min_end)
+        duration = segments[window_end]['end'] - start
+        if duration < min_duration:
+            continue
+        candidates.append((-(prefix[window_end + 1] - prefix[start_index]), start_index, window_end))
+    
+    # Extrai as melhores janelas do heap, ignorando as que se sobrepõem às já escolhidas
+    heapq.heapify(candidates)
+    chosen = []
+    while candidates and len(chosen) < 10:
+        negative_score, start_index, window_end = heapq.heappop(candidates)
+        start = segments[start_index]['start']
+        end_time = segments[window_end]['end']
+        if any(start < other_end and other_start < end_time for other_start, other_end, _ in chosen):
+            continue
+        chosen.append((start, end_time, (-negative_score, start_index, window_end)))
+    
+    viral_moments = []
+    for start, end_time, (score, start_index, window_end) in chosen:
+        viral_moments.append({
+            'start': start,
+            'end': end_time,
+            'duration': end_time - start,
+            'text': ' '.join(seg['text'] for seg in segments[start_index:window_end + 1]),
+            'score': score
+        })
+    return viral_moments  # Top 10 momentos, do maior score para o menor
+
+# Pool limitado de processos ffmpeg para cortes (reels e aulas)
+def is_rotational_disk(path):
+    """Indica se o caminho está num disco rotacional (HD), consultando o sysfs do Linux"""
+    try:
+        dev = os.stat(path).st_dev
+        block = Path(f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}").resolve()
+        # Partições (sda1) não têm queue/, o disco pai (sda) tem
+        for candidate in (block / 'queue' / 'rotational', block.parent / 'queue' / 'rotational'):
+            if candidate.exists():
+                return candidate.read_text().strip() == '1'
+    except (OSError, ValueError):
+        pass
+    return False
+
+def default_clip_workers(path):
+    """Define quantos cortes simultâneos rodar conforme CPUs e tipo de disco"""
+    configured = os.getenv('CLIP_WORKERS')
+    if configured:
+        return max(1, int(configured))
+    # Cortes com -c copy são limitados por I/O: HDs sofrem com muitas leituras concorrentes
+    disk_limit = 2 if is_rotational_disk(path) else 4
+    return max(1, min(os.cpu_count() or 1, disk_limit))
+
+CLIP_WORKERS = default_clip_workers(DOWNLOAD_FOLDER)
+clip_executor = ThreadPoolExecutor(max_workers=CLIP_WORKERS, thread_name_prefix='clip')
+
+def run_clip_commands(cmds):
+    """Executa comandos ffmpeg no pool de cortes e retorna os erros na ordem dos comandos (None = sucesso)"""
+    def run(cmd):
+        try:
+            subprocess.run(cmd, capture_output=True, check=True)
+            return None
+        except subprocess.CalledProcessError as e:
+            return e.stderr.decode(errors='replace') if e.stderr else str(e)
+        except OSError as e:
+            return str(e)
+
+    futures = [clip_executor.submit(run, cmd) for cmd in cmds]
+    return [future.result() for future in futures]
+
+# Máximo de trechos por invocação do ffmpeg (cada trecho abre a entrada de novo com seek)
+CUT_BATCH_SIZE = int(os.getenv('CUT_BATCH_SIZE', '16'))
+
+def build_cut_command(ffmpeg_path, video_path, cuts):
+    """Monta um único comando ffmpeg que gera vários trechos com seek na entrada
+
+    Cada trecho vira uma entrada com -ss/-t antes do -i (o ffmpeg pula direto
+    para o keyframe, sem decodificar desde o início) mapeada para sua saída.
+    """
+    cmd = [ffmpeg_path, '-hide_banner', '-v', 'error', '-nostdin', '-y']
+    for start, duration, _ in cuts:
+        cmd += ['-ss', str(start), '-t', str(duration), '-i', str(video_path)]
+    for index, (_, _, output_path) in enumerate(cuts):
+        cmd += [
+            '-map', f'{index}:v:0?',
+            '-map', f'{index}:a:0?',
+            '-c', 'copy',
+            '-avoid_negative_ts', 'make_zero',
+            str(output_path)
+        ]
+    return cmd
+
+def cut_segments(video_path, cuts, ffmpeg_path=None):
+    """Corta vários trechos (start, duration, output_path) do mesmo vídeo
+
+    Os trechos são agrupados em lotes de CUT_BATCH_SIZE, um processo ffmpeg por
+    lote, executados no pool de cortes. Se um lote falha, seus trechos são
+    refeitos individualmente para isolar o erro. Retorna os erros na ordem dos
+    trechos (None = sucesso).
+    """
+    ffmpeg_path = ffmpeg_path or shutil.which('ffmpeg')
+    if not ffmpeg_path:
+        raise Exception('ffmpeg não encontrado')
+    batch_size = max(1, CUT_BATCH_SIZE)
+    batches = [cuts[i:i + batch_size] for i in range(0, len(cuts), batch_size)]
+    cut_started = time.monotonic()
+    batch_errors = run_clip_commands([build_cut_command(ffmpeg_path, video_path, batch) for batch in batches])
+
+    errors = []
+    retry = []
+    for batch, error in zip(batches, batch_errors):
+        if error and len(batch) > 1:
+            retry.extend(range(len(errors), len(errors) + len(batch)))
+        errors.extend([error] * len(batch))
+    if retry:
+        retry_errors = run_clip_commands([build_cut_command(ffmpeg_path, video_path, [cuts[i]]) for i in retry])
+        for i, error in zip(retry, retry_errors):
+            errors[i] = error
+    metrics.observe('stage_duration_seconds', time.monotonic() - cut_started, stage='clip_cut')
+    return errors
 
 def create_video_clips(video_path, viral_moments, output_folder):
-    """Cria cortes de vídeo usando ffmpeg"""
+    """Cria cortes de vídeo usando ffmpeg; retorna (clips, erros)"""
     ffmpeg_path = shutil.which('ffmpeg')
     if not ffmpeg_path:
         raise Exception('ffmpeg não encontrado')
     
-    clips = []
     output_folder.mkdir(exist_ok=True)
     
+    cuts = []
     for i, moment in enumerate(viral_moments, 1):
-        start_time = moment['start']
-        duration = moment['duration']
-        
         # Nome do arquivo
-        clip_name = f"clip_{i:02d}_{int(start_time)}s.mp4"
-        clip_path = output_folder / clip_name
-        
-        # Comando ffmpeg para cortar
-        cmd = [
-            ffmpeg_path,
-            '-i', str(video_path),
-            '-ss', str(start_time),
-            '-t', str(duration),
-            '-c', 'copy',  # Copy codec para ser mais rápido
-            '-avoid_negative_ts', 'make_zero',
-            '-y',
-            str(clip_path)
-        ]
-        
-        try:
-            subprocess.run(cmd, capture_output=True, check=True)
-            clips.append({
-                'filename': clip_name,
-                'path': str(clip_path),
-                'start': start_time,
-                'duration': duration,
-                'text': moment['text'][:100] + '...' if len(moment['text']) > 100 else moment['text']
-            })
-        except subprocess.CalledProcessError as e:
-            print(f"Erro ao criar clip {i}: {e.stderr.decode() if e.stderr else str(e)}")
+        clip_name = f"clip_{i:02d}_{int(moment['start'])}s.mp4"
+        cuts.append((moment['start'], moment['duration'], output_folder / clip_name))
+    
+    clips = []
+    errors = []
+    cut_errors = cut_segments(video_path, cuts, ffmpeg_path)
+    for i, (moment, (_, _, clip_path), error) in enumerate(zip(viral_moments, cuts, cut_errors), 1):
+        if error:
+            print(f"Erro ao criar clip {i}: {error}")
+            errors.append({'clip': clip_path.name, 'error': error})
             continue
+        clips.append({
+            'filename': clip_path.name,
+            'path': str(clip_path),
+            'start': moment['start'],
+            'duration': moment['duration'],
+            'text': moment['text'][:100] + '...' if len(moment['text']) > 100 else moment['text']
+        })
     
-    return clips
+    media_index.update_paths([clip['path'] for clip in clips])
+    metrics.inc('clips_created_total', len(clips), kind='reel')
+    return clips, errors
+
+def next_lesson_sequence(lessons_folder):
+    """Próximo número de aula, após o maior prefixo numérico existente na pasta"""
+    sequence = 0
+    for f in lessons_folder.glob('*'):
+        if f.is_file() and f.suffix in VIDEO_EXTENSIONS:
+            match = re.match(r'(\d+)', f.name)
+            sequence = max(sequence, int(match.group(1)) if match else 0)
+    return sequence + 1
 
 def sanitize_filename(name):
     """Sanitiza nomes para uso em arquivos"""
@@ -1000,44 +2858,160 @@ def resolve_course_path(course_name):
 
 def list_course_directories():
     """Retorna diretórios considerados cursos"""
+    video_counts = {}
+    for row in media_index.list_files():
+        course = row['course']
+        if not course or os.path.splitext(row['name'])[1] not in VIDEO_EXTENSIONS:
+            continue
+        video_counts[course] = video_counts.get(course, 0) + 1
     courses = []
-    for folder in DOWNLOAD_FOLDER.iterdir():
-        if folder.is_dir() and not folder.name.endswith('_reels'):
-            video_files = list(folder.rglob('*'))
-            video_files = [f for f in video_files if f.is_file() and f.suffix in VIDEO_EXTENSIONS]
-            if video_files:
-                lessons_folder = folder / LESSONS_FOLDER_NAME
-                courses.append({
-                    'name': folder.name,
-                    'video_count': len(video_files),
-                    'has_lessons': lessons_folder.exists(),
-                    'lessons_count': len(list(lessons_folder.glob('*'))) if lessons_folder.exists() else 0
-                })
+    for course, video_count in video_counts.items():
+        lessons_folder = DOWNLOAD_FOLDER / course / LESSONS_FOLDER_NAME
+        # Conta tudo o que está na pasta de aulas (vídeos, legendas, textos), como sempre foi
+        try:
+            with os.scandir(lessons_folder) as entries:
+                lessons_count = sum(1 for _ in entries)
+            has_lessons = True
+        except (FileNotFoundError, NotADirectoryError):
+            lessons_count = 0
+            has_lessons = lessons_folder.exists()
+        courses.append({
+            'name': course,
+            'video_count': video_count,
+            'has_lessons': has_lessons,
+            'lessons_count': lessons_count
+        })
     courses.sort(key=lambda c: c['name'].lower())
     return courses
 
-def get_video_duration(video_path):
-    """Obtém duração do vídeo usando ffprobe"""
-    ffprobe_path = shutil.which('ffprobe')
-    if not ffprobe_path:
-        return None
+# Cache persistente de metadados do ffprobe, chaveado por (caminho, tamanho, mtime_ns)
+PROBE_WORKERS = int(os.getenv('PROBE_WORKERS', '4'))
+PROBE_KEYFRAME_SECONDS = 30  # Trecho inicial lido para estimar o intervalo entre keyframes
+probe_executor = ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix='ffprobe')
+
+def init_probe_cache():
+    conn = get_state_db()
+    with conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS probe_cache (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                duration REAL,
+                video_codec TEXT,
+                audio_codec TEXT,
+                keyframe_interval REAL,
+                streams TEXT,
+                probed_at REAL NOT NULL
+            )
+        """)
+
+init_probe_cache()
+
+def run_ffprobe(ffprobe_path, media_path):
+    """Executa o ffprobe e extrai duração, streams, codecs e intervalo de keyframes"""
+    probe_started = time.monotonic()
     try:
         result = subprocess.run(
             [
                 ffprobe_path,
                 '-v', 'error',
-                '-show_entries', 'format=duration',
-                '-of', 'default=noprint_wrappers=1:nokey=1',
-                str(video_path)
+                '-read_intervals', f'%+{PROBE_KEYFRAME_SECONDS}',
+                '-show_entries',
+                'format=duration'
+                ':stream=index,codec_type,codec_name,width,height,avg_frame_rate,sample_rate,channels'
+                ':packet=stream_index,pts_time,flags',
+                '-of', 'json',
+                str(media_path)
             ],
             capture_output=True,
             text=True,
             check=True
         )
-        duration = float(result.stdout.strip())
-        return round(duration, 2)
+        data = json.loads(result.stdout)
     except Exception:
-        return None
+        return {'duration': None, 'video_codec': None, 'audio_codec': None,
+                'keyframe_interval': None, 'streams': []}
+    finally:
+        metrics.observe('stage_duration_seconds', time.monotonic() - probe_started, stage='probe')
+
+    streams = data.get('streams', [])
+    video = next((st for st in streams if st.get('codec_type') == 'video'), None)
+    audio = next((st for st in streams if st.get('codec_type') == 'audio'), None)
+    try:
+        duration = round(float(data.get('format', {}).get('duration')), 2)
+    except (TypeError, ValueError):
+        duration = None
+
+    keyframe_interval = None
+    if video:
+        keyframes = sorted(
+            float(packet['pts_time']) for packet in data.get('packets', [])
+            if packet.get('stream_index') == video.get('index')
+            and 'K' in packet.get('flags', '') and packet.get('pts_time') not in (None, 'N/A')
+        )
+        gaps = sorted(b - a for a, b in zip(keyframes, keyframes[1:]) if b > a)
+        if gaps:
+            keyframe_interval = round(gaps[len(gaps) // 2], 3)
+
+    return {
+        'duration': duration,
+        'video_codec': video.get('codec_name') if video else None,
+        'audio_codec': audio.get('codec_name') if audio else None,
+        'keyframe_interval': keyframe_interval,
+        'streams': streams,
+    }
+
+def probe_media(paths):
+    """Retorna metadados de vários arquivos, usando o cache e rodando ffprobe em paralelo nos misses"""
+    conn = get_state_db()
+    results = {}
+    misses = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            results[path] = None
+            continue
+        row = conn.execute('SELECT * FROM probe_cache WHERE path = ?', (str(path),)).fetchone()
+        if row and row['size'] == st.st_size and row['mtime_ns'] == st.st_mtime_ns:
+            results[path] = {
+                'size': row['size'],
+                'duration': row['duration'],
+                'video_codec': row['video_codec'],
+                'audio_codec': row['audio_codec'],
+                'keyframe_interval': row['keyframe_interval'],
+                'streams': json.loads(row['streams'] or '[]'),
+            }
+        else:
+            misses.append((path, st))
+
+    if misses:
+        ffprobe_path = shutil.which('ffprobe')
+        if not ffprobe_path:
+            for path, st in misses:
+                results[path] = None
+            return results
+        probed = probe_executor.map(lambda item: run_ffprobe(ffprobe_path, item[0]), misses)
+        rows = []
+        for (path, st), metadata in zip(misses, probed):
+            results[path] = {'size': st.st_size, **metadata}
+            rows.append((
+                str(path), st.st_size, st.st_mtime_ns, metadata['duration'],
+                metadata['video_codec'], metadata['audio_codec'], metadata['keyframe_interval'],
+                json.dumps(metadata['streams']), time.time()
+            ))
+            media_index.set_duration(path, metadata['duration'])
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO probe_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows
+            )
+    return results
+
+def get_video_duration(video_path):
+    """Obtém duração do vídeo usando ffprobe (com cache)"""
+    metadata = probe_media([video_path]).get(video_path)
+    return metadata['duration'] if metadata else None
 
 def find_subtitle_for_video(video_path):
     """Localiza arquivo de legenda correspondente a um vídeo"""
@@ -1053,17 +3027,18 @@ def find_subtitle_for_video(video_path):
     return None
 
 def gather_course_videos(course_path):
+    files = [f for f in course_path.iterdir() if f.is_file() and f.suffix in VIDEO_EXTENSIONS]
+    probes = probe_media(files)
     videos = []
-    for file in course_path.iterdir():
-        if file.is_file() and file.suffix in VIDEO_EXTENSIONS:
-            duration = get_video_duration(file)
-            subtitle = find_subtitle_for_video(file)
-            videos.append({
-                'name': file.name,
-                'size': file.stat().st_size,
-                'duration': duration,
-                'has_subtitles': subtitle is not None
-            })
+    for file in files:
+        metadata = probes.get(file)
+        subtitle = find_subtitle_for_video(file)
+        videos.append({
+            'name': file.name,
+            'size': metadata['size'] if metadata else file.stat().st_size,
+            'duration': metadata['duration'] if metadata else None,
+            'has_subtitles': subtitle is not None
+        })
     videos.sort(key=lambda v: v['name'].lower())
     return videos
 
@@ -1081,6 +3056,713 @@ def resolve_video_path(course_name, filename):
         raise ValueError('Arquivo selecionado não é um vídeo suportado')
     return course_path, video_path
 
+# Pipeline de transcrição: extração de áudio (ffmpeg) roda à frente da inferência
+TRANSCRIBE_EXTRACT_WORKERS = int(os.getenv('TRANSCRIBE_EXTRACT_WORKERS', '1'))
+TRANSCRIBE_QUEUE_DEPTH = int(os.getenv('TRANSCRIBE_QUEUE_DEPTH', '2'))
+# 'stream' envia o PCM do ffmpeg direto para o Whisper; 'file' usa WAV temporário
+TRANSCRIBE_AUDIO_MODE = os.getenv('TRANSCRIBE_AUDIO_MODE', 'stream')
+# Tamanho de cada bloco de áudio no modo stream (limita o pico de memória)
+TRANSCRIBE_STREAM_CHUNK_SECONDS = int(os.getenv('TRANSCRIBE_STREAM_CHUNK_SECONDS', '1800'))
+# Áudio decodificado à frente do modelo, somando todos os streams abertos pelo pipeline
+TRANSCRIBE_STREAM_BUFFER_MB = int(os.getenv('TRANSCRIBE_STREAM_BUFFER_MB', '512'))
+WHISPER_SAMPLE_RATE = 16000
+# Vídeos longos: trechos cortados em silêncios e transcritos em paralelo pelo pool de
+# processos do serviço de transcrição (ParallelTranscriptionPool)
+TRANSCRIBE_PARALLEL_WORKERS = int(os.getenv('TRANSCRIBE_PARALLEL_WORKERS', '1'))
+TRANSCRIBE_PARALLEL_MIN_SECONDS = int(os.getenv('TRANSCRIBE_PARALLEL_MIN_SECONDS', '1800'))
+# Até quantos segundos em torno do corte ideal procurar o trecho mais silencioso
+TRANSCRIBE_SILENCE_SEARCH_SECONDS = int(os.getenv('TRANSCRIBE_SILENCE_SEARCH_SECONDS', '30'))
+SILENCE_FRAME_SECONDS = 0.1
+SILENCE_SMOOTH_FRAMES = 5
+
+def extract_audio_file(ffmpeg_path, video_path):
+    """Extrai o áudio do vídeo para um WAV temporário 16 kHz mono"""
+    audio_path = video_path.parent / f"{video_path.stem}_temp_audio.wav"
+    try:
+        with metrics.time_stage('audio_extract'):
+            subprocess.run([
+                ffmpeg_path, '-i', str(video_path),
+                '-ar', str(WHISPER_SAMPLE_RATE),  # Taxa de amostragem para Whisper
+                '-ac', '1',  # Mono
+                '-y',
+                str(audio_path)
+            ], capture_output=True, check=True)
+    except BaseException:
+        # Falha ou interrupção do ffmpeg deixaria um WAV parcial ao lado do vídeo
+        audio_path.unlink(missing_ok=True)
+        raise
+    return audio_path
+
+def frame_energies(samples):
+    """Energia (RMS) de cada quadro completo de SILENCE_FRAME_SECONDS"""
+    frame = int(WHISPER_SAMPLE_RATE * SILENCE_FRAME_SECONDS)
+    usable = len(samples) // frame * frame
+    if not usable:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:usable].reshape(-1, frame)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+def smooth_energies(energies):
+    """Média móvel: prefere pausas a quedas de um único quadro no meio de uma palavra"""
+    if len(energies) < SILENCE_SMOOTH_FRAMES:
+        return energies
+    kernel = np.ones(SILENCE_SMOOTH_FRAMES)
+    # Divide pela quantidade de quadros somados, para as bordas não parecerem mais silenciosas
+    return np.convolve(energies, kernel, mode='same') / np.convolve(np.ones(len(energies)), kernel, mode='same')
+
+def quietest_cut(samples, search_samples):
+    """Índice de corte no quadro mais silencioso entre as últimas `search_samples` amostras"""
+    frame = int(WHISPER_SAMPLE_RATE * SILENCE_FRAME_SECONDS)
+    start = max(0, len(samples) - search_samples) // frame * frame
+    energies = smooth_energies(frame_energies(samples[start:]))
+    if not len(energies):
+        return len(samples)
+    return start + int(np.argmin(energies)) * frame
+
+class AudioBufferBudget:
+    """Limita o áudio decodificado em memória somando todos os AudioStreams
+
+    O stream sendo transcrito nunca espera (senão o pipeline travaria); os que só
+    leem à frente esperam até caber no limite.
+    """
+
+    def __init__(self, limit_bytes):
+        self.limit_bytes = limit_bytes
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, stream, size):
+        with self._cond:
+            while not stream.active and self.used + size > self.limit_bytes:
+                if stream.closed:
+                    return False
+                self._cond.wait(0.5)
+            self.used += size
+            return True
+
+    def release(self, size):
+        with self._cond:
+            self.used -= size
+            self._cond.notify_all()
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+audio_buffer_budget = AudioBufferBudget(TRANSCRIBE_STREAM_BUFFER_MB * 1024 * 1024)
+
+class AudioStream:
+    """Decodifica PCM 16 kHz mono do stdout do ffmpeg em blocos, sem arquivo em disco
+
+    Uma thread lê blocos de até `chunk_seconds` e os deixa numa fila limitada, então a
+    decodificação adianta no máximo `max_buffered_chunks` blocos em relação ao modelo,
+    dentro do limite global do audio_buffer_budget. Com `split_at_silence`, cada bloco
+    termina no ponto mais silencioso dos seus últimos segundos e o resto abre o próximo,
+    para não cortar palavras; os tempos continuam exatos (soma das amostras).
+    """
+
+    def __init__(self, ffmpeg_path, media_path, chunk_seconds=None, max_buffered_chunks=1,
+                 split_at_silence=True):
+        self.media_path = media_path
+        self.cmd = [
+            ffmpeg_path, '-nostdin', '-v', 'error',
+            '-i', str(media_path),
+            '-f', 's16le',
+            '-ac', '1',
+            '-ar', str(WHISPER_SAMPLE_RATE),
+            '-'
+        ]
+        chunk_seconds = chunk_seconds or TRANSCRIBE_STREAM_CHUNK_SECONDS
+        self.chunk_samples = chunk_seconds * WHISPER_SAMPLE_RATE
+        self.search_samples = int(min(TRANSCRIBE_SILENCE_SEARCH_SECONDS, chunk_seconds / 4) * WHISPER_SAMPLE_RATE)
+        self.split_at_silence = split_at_silence
+        # Reserva por bloco no orçamento global: o maior bloco possível em float32
+        self.chunk_reserve = self.chunk_samples * 4
+        self.active = False
+        self._reserved = 0
+        self._reserve_lock = threading.Lock()
+        self._chunks = queue.Queue(maxsize=max(1, max_buffered_chunks))
+        self._stderr = b''
+        self._closed = threading.Event()
+        self.proc = subprocess.Popen(self.cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._stderr_thread = threading.Thread(target=self._read_stderr, daemon=True)
+        self._stderr_thread.start()
+        self._reader = threading.Thread(target=self._read_stdout, name='audio-stream', daemon=True)
+        self._reader.start()
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+    def _read_stderr(self):
+        for line in self.proc.stderr:
+            self._stderr = (self._stderr + line)[-4096:]
+
+    def _reserve(self):
+        if not audio_buffer_budget.acquire(self, self.chunk_reserve):
+            return False
+        with self._reserve_lock:
+            if self._closed.is_set():
+                audio_buffer_budget.release(self.chunk_reserve)
+                return False
+            self._reserved += self.chunk_reserve
+        return True
+
+    def _unreserve(self, size):
+        with self._reserve_lock:
+            size = min(size, self._reserved)
+            self._reserved -= size
+        if size:
+            audio_buffer_budget.release(size)
+
+    def _read_stdout(self):
+        carry = np.zeros(0, dtype=np.float32)
+        # Tempo esperando o ffmpeg decodificar: a etapa audio_extract do modo stream
+        decode_seconds = 0.0
+        try:
+            while not self._closed.is_set():
+                if not self._reserve():
+                    return
+                wanted = self.chunk_samples - len(carry)
+                read_started = time.monotonic()
+                data = self.proc.stdout.read(wanted * 2)
+                # s16le -> float32 em [-1, 1], o formato que o Whisper espera
+                samples = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+                del data
+                decode_seconds += time.monotonic() - read_started
+                final = len(samples) < wanted
+                chunk = np.concatenate([carry, samples]) if len(carry) else samples
+                del samples
+                if self.split_at_silence and not final:
+                    cut = quietest_cut(chunk, self.search_samples)
+                    chunk, carry = chunk[:cut], chunk[cut:].copy()
+                else:
+                    carry = np.zeros(0, dtype=np.float32)
+                if not len(chunk):
+                    self._unreserve(self.chunk_reserve)
+                    break
+                if not self._put(chunk):
+                    return
+                if final:
+                    break
+        finally:
+            metrics.observe('stage_duration_seconds', decode_seconds, stage='audio_extract')
+            self._put(None)
+
+    def _put(self, item):
+        while not self._closed.is_set():
+            try:
+                self._chunks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self):
+        # A partir daqui este é o stream que o modelo consome: não espera pelo orçamento
+        self.active = True
+        audio_buffer_budget.wake()
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                break
+            try:
+                yield chunk
+            finally:
+                del chunk
+                self._unreserve(self.chunk_reserve)
+        returncode = self.proc.wait()
+        self._stderr_thread.join(timeout=1)
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, self.cmd, stderr=self._stderr)
+
+    def close(self):
+        self._closed.set()
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.wait()
+        self.proc.stdout.close()
+        # Blocos lidos e não consumidos devolvem sua parte do orçamento
+        self._unreserve(self._reserved)
+        audio_buffer_budget.wake()
+
+def transcribe_audio_stream(model, stream):
+    """Transcreve um AudioStream bloco a bloco e junta os segmentos com tempos globais"""
+    results = []
+    offset = 0.0
+    prompt = None
+    for chunk in stream:
+        result = model.transcribe(
+            chunk,
+            language='pt',
+            task='transcribe',
+            initial_prompt=prompt
+        )
+        results.append((offset, result))
+        offset += len(chunk) / WHISPER_SAMPLE_RATE
+        # O final do bloco anterior dá contexto para o próximo
+        prompt = result.get('text', '')[-200:] or None
+    return merge_chunk_results(results)
+
+def merge_chunk_results(results):
+    """Junta resultados de trechos [(offset, result)] num único resultado com tempos globais"""
+    if len(results) == 1:
+        return results[0][1]
+    segments = []
+    for chunk_offset, result in results:
+        for segment in result.get('segments', []):
+            segments.append({
+                **segment,
+                'id': len(segments),
+                'start': segment.get('start', 0) + chunk_offset,
+                'end': segment.get('end', 0) + chunk_offset,
+            })
+    return {
+        'text': ''.join(result.get('text', '') for _, result in results),
+        'segments': segments,
+        'language': 'pt',
+    }
+
+class ParallelAudioSource:
+    """Vídeo longo a ser transcrito em trechos pelo pool de processos do serviço"""
+
+    def __init__(self, ffmpeg_path, media_path, model_size, pool):
+        self.ffmpeg_path = ffmpeg_path
+        self.media_path = media_path
+        self.model_size = model_size
+        self.pool = pool
+
+def measure_audio_energy(ffmpeg_path, media_path):
+    """Energia (RMS) do áudio em quadros de SILENCE_FRAME_SECONDS"""
+    stream = AudioStream(ffmpeg_path, media_path, chunk_seconds=60, max_buffered_chunks=4,
+                         split_at_silence=False)
+    energies = []
+    try:
+        for chunk in stream:
+            energies.append(frame_energies(chunk))
+    finally:
+        stream.close()
+    return np.concatenate(energies) if energies else np.zeros(0, dtype=np.float32)
+
+def find_silence_splits(energies, duration, chunks):
+    """Escolhe chunks - 1 cortes, cada um no ponto mais silencioso perto da divisão igual"""
+    energies = smooth_energies(energies)
+    radius = int(min(TRANSCRIBE_SILENCE_SEARCH_SECONDS, duration / chunks / 4) / SILENCE_FRAME_SECONDS)
+    splits = []
+    for i in range(1, chunks):
+        center = int(duration * i / chunks / SILENCE_FRAME_SECONDS)
+        low, high = max(0, center - radius), min(len(energies), center + radius + 1)
+        best = low + int(np.argmin(energies[low:high])) if low < high else center
+        splits.append((best + 0.5) * SILENCE_FRAME_SECONDS)
+    return splits
+
+class ParallelTranscriptionPool:
+    """Pool de processos do serviço de transcrição para vídeos longos
+
+    Fica no ar entre os jobs, então cada processo carrega o modelo uma única vez. Só há
+    um pool por vez (trocar de modelo encerra o anterior) e a memória dos seus modelos
+    é reservada no orçamento do whisper_models.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.model_size = None
+        self._executor = None
+        self._executor_workers = 0
+        self._lock = threading.Lock()
+
+    def workers_for(self, model_size):
+        """Processos que cabem no orçamento de memória para este modelo"""
+        estimate = WHISPER_MODEL_ESTIMATES_MB.get(model_size, 1000) * 1024 * 1024
+        return min(self.workers, whisper_models.budget_bytes // estimate)
+
+    def accepts(self, model_size, media_path):
+        """Indica se o vídeo vai para o pool: longo o bastante e com ao menos 2 processos"""
+        if self.workers_for(model_size) < 2:
+            return False
+        duration = get_video_duration(media_path)
+        return bool(duration and duration >= TRANSCRIBE_PARALLEL_MIN_SECONDS)
+
+    def _get_executor(self, model_size):
+        with self._lock:
+            if self._executor is not None and self.model_size == model_size:
+                return self._executor, self._executor_workers
+            self._shutdown()
+            workers = self.workers_for(model_size)
+            estimate = WHISPER_MODEL_ESTIMATES_MB.get(model_size, 1000) * 1024 * 1024
+            whisper_models.reserve('parallel-pool', workers * estimate)
+            print(f"Iniciando pool de transcrição paralela: {workers} processo(s) com o modelo {model_size}")
+            # Cada processo usa sua parte dos núcleos
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=transcription_worker.init_worker,
+                initargs=(model_size, threads)
+            )
+            self._executor_workers = workers
+            self.model_size = model_size
+            return self._executor, workers
+
+    def transcribe(self, source):
+        """Corta o áudio em silêncios e transcreve um trecho por processo"""
+        executor, workers = self._get_executor(source.model_size)
+        duration = get_video_duration(source.media_path)
+        energies = measure_audio_energy(source.ffmpeg_path, source.media_path)
+        bounds = [0.0, *find_silence_splits(energies, duration, workers)]
+        print(f"Transcrevendo {source.media_path.name} em {len(bounds)} trechos paralelos...")
+        futures = []
+        try:
+            for index, start in enumerate(bounds):
+                # O último trecho vai até o fim do arquivo, sem depender da duração do ffprobe
+                chunk_duration = bounds[index + 1] - start if index + 1 < len(bounds) else None
+                futures.append(executor.submit(
+                    transcription_worker.transcribe_chunk,
+                    source.ffmpeg_path, str(source.media_path), start, chunk_duration
+                ))
+            results = [(start, future.result()) for start, future in zip(bounds, futures)]
+        except BrokenProcessPool:
+            # Um processo morreu (ex.: falta de memória): o próximo vídeo sobe um pool novo
+            self.shutdown()
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+        return merge_chunk_results(results)
+
+    def _shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+            self.model_size = None
+            whisper_models.release('parallel-pool')
+
+    def shutdown(self):
+        """Encerra os processos e libera a memória reservada"""
+        with self._lock:
+            self._shutdown()
+
+    def stats(self):
+        with self._lock:
+            if self._executor is None:
+                return None
+            return {'model': self.model_size, 'workers': self._executor_workers}
+
+def open_audio_source(ffmpeg_path, media_path, parallel_pool=None, model_size=None):
+    """Prepara o áudio para o Whisper conforme TRANSCRIBE_AUDIO_MODE"""
+    if parallel_pool is not None and parallel_pool.accepts(model_size, media_path):
+        return ParallelAudioSource(ffmpeg_path, media_path, model_size, parallel_pool)
+    if TRANSCRIBE_AUDIO_MODE == 'file':
+        if media_path.suffix in ['.mp4', '.webm', '.mkv']:
+            return extract_audio_file(ffmpeg_path, media_path)
+        return media_path
+    return AudioStream(ffmpeg_path, media_path)
+
+def transcribe_audio_source(model, source):
+    """Transcreve um AudioStream ou arquivo de áudio"""
+    # No modo stream a decodificação do ffmpeg corre em paralelo e entra nesta medida
+    with metrics.time_stage('inference'):
+        if isinstance(source, AudioStream):
+            return transcribe_audio_stream(model, source)
+        if isinstance(source, ParallelAudioSource):
+            return source.pool.transcribe(source)
+        return model.transcribe(
+            str(source),
+            language='pt',
+            task='transcribe'
+        )
+
+def close_audio_source(source, media_path):
+    """Encerra o stream ou remove o WAV temporário"""
+    if isinstance(source, AudioStream):
+        source.close()
+    elif isinstance(source, ParallelAudioSource):
+        return
+    elif source != media_path and source.exists():
+        source.unlink()
+
+def save_whisper_outputs(result, video_path):
+    """Salva a transcrição em VTT e texto ao lado do vídeo"""
+    vtt_path = video_path.parent / f"{video_path.stem}.pt.vtt"
+    txt_path = video_path.parent / f"{video_path.stem}_whisper.txt"
+    with metrics.time_stage('vtt_write'):
+        whisper_result_to_vtt(result, vtt_path)
+        txt_path.write_text(result['text'], encoding='utf-8')
+    media_index.update_paths([vtt_path, txt_path])
+    return vtt_path, txt_path
+
+def iter_pipelined_transcriptions(model, ffmpeg_path, video_paths, extract_workers=None,
+                                  queue_depth=None, model_size=None, parallel_pool=None, on_stage=None):
+    """Transcreve vídeos em ordem, mantendo extrações de áudio à frente do modelo
+
+    Um produtor abre as fontes de áudio num pool de `extract_workers` threads e
+    coloca os futures numa fila limitada a `queue_depth` itens; o consumidor
+    (thread atual) roda model.transcribe. Com `parallel_pool`, vídeos longos vão
+    para o pool de processos; `model` pode então ser None, e o modelo `model_size`
+    só é carregado se algum vídeo precisar dele. `on_stage(video_path, etapa)` é chamado ao entrar em
+    'extracting' e 'transcribing'. Gera (video_path, result, error).
+    """
+    extract_workers = max(1, extract_workers or TRANSCRIBE_EXTRACT_WORKERS)
+    queue_depth = max(1, queue_depth or TRANSCRIBE_QUEUE_DEPTH)
+    pending = queue.Queue(maxsize=queue_depth)
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=extract_workers, thread_name_prefix='extract-audio')
+
+    def offer(item):
+        """Coloca o item na fila; desiste (False) se o consumidor parou"""
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        for video_path in video_paths:
+            future = executor.submit(open_audio_source, ffmpeg_path, video_path, parallel_pool, model_size)
+            if not offer((video_path, future)):
+                future.cancel()
+                return
+        offer(None)
+
+    producer = threading.Thread(target=produce, name='extract-audio-producer', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+            video_path, future = item
+            source = None
+            try:
+                print(f"Extraindo áudio de {video_path.name}...")
+                if on_stage:
+                    on_stage(video_path, 'extracting')
+                source = future.result()
+                print(f"Transcrevendo {video_path.name}...")
+                if on_stage:
+                    on_stage(video_path, 'transcribing')
+                if model is None and not isinstance(source, ParallelAudioSource):
+                    model = whisper_models.get(model_size)
+                result = transcribe_audio_source(model, source)
+            except Exception as e:
+                result, error = None, e
+            else:
+                error = None
+            finally:
+                if source is not None:
+                    close_audio_source(source, video_path)
+            yield video_path, result, error
+    finally:
+        # Interrompe o produtor e descarta áudios extraídos que não serão usados
+        stop.set()
+        while True:
+            try:
+                item = pending.get_nowait()
+            except queue.Empty:
+                if not producer.is_alive():
+                    break
+                producer.join(timeout=0.5)
+                continue
+            if item is None:
+                continue
+            video_path, future = item
+            if not future.cancel():
+                try:
+                    close_audio_source(future.result(), video_path)
+                except Exception:
+                    pass
+        executor.shutdown(wait=False)
+
+# Serviço de transcrição: um processo único dono dos modelos Whisper e da fila de jobs,
+# atendendo todos os workers do gunicorn por um socket Unix local
+TRANSCRIPTION_SERVICE = os.getenv('TRANSCRIPTION_SERVICE', 'auto')  # auto | off
+TRANSCRIPTION_SOCKET = Path(os.getenv('TRANSCRIPTION_SOCKET') or STATE_FOLDER / "transcription.sock")
+TRANSCRIPTION_KEY_FILE = STATE_FOLDER / "transcription.key"
+
+def describe_transcription_error(error):
+    """Mensagem de erro de transcrição para a API"""
+    if isinstance(error, subprocess.CalledProcessError):
+        stderr = error.stderr.decode(errors='replace') if isinstance(error.stderr, bytes) else error.stderr
+        return f'Erro ao extrair áudio: {stderr or error}'
+    return str(error)
+
+def transcribe_and_save(video_paths, model_size, cancelled=None, on_stage=None, parallel_pool=None):
+    """Transcreve no processo atual e salva VTT/TXT; gera (video_path, resumo, erro)"""
+    ffmpeg_path = shutil.which('ffmpeg')
+    if not ffmpeg_path:
+        raise Exception('ffmpeg não encontrado')
+    # Vídeos longos vão para o pool; o modelo local só é carregado se algum vídeo precisar
+    if parallel_pool is not None and all(parallel_pool.accepts(model_size, path) for path in video_paths):
+        model = None
+    else:
+        model = whisper_models.get(model_size)
+    pipeline = iter_pipelined_transcriptions(model, ffmpeg_path, video_paths, model_size=model_size,
+                                             parallel_pool=parallel_pool, on_stage=on_stage)
+    try:
+        for video_path, result, error in pipeline:
+            summary = None
+            if error is None:
+                try:
+                    vtt_path, txt_path = save_whisper_outputs(result, video_path)
+                    summary = {
+                        'vtt_path': str(vtt_path),
+                        'txt_path': str(txt_path),
+                        'text': result['text'][:1000],
+                        'full_length': len(result['text'])
+                    }
+                except Exception as e:
+                    error = e
+            yield video_path, summary, describe_transcription_error(error) if error is not None else None
+            if cancelled is not None and cancelled.is_set():
+                break
+    finally:
+        pipeline.close()
+
+def connect_transcription_service():
+    """Abre conexão com o serviço de transcrição, ou None se ele não estiver disponível"""
+    if TRANSCRIPTION_SERVICE == 'off' or not TRANSCRIPTION_SOCKET.exists():
+        return None
+    try:
+        return Client(str(TRANSCRIPTION_SOCKET), family='AF_UNIX', authkey=TRANSCRIPTION_KEY_FILE.read_bytes())
+    except (OSError, EOFError, multiprocessing.AuthenticationError) as e:
+        print(f"Serviço de transcrição indisponível, transcrevendo no próprio worker: {e}")
+        return None
+
+def transcribe_videos(video_paths, model_size, on_stage=None):
+    """Transcreve e salva os vídeos no serviço dedicado (ou no próprio worker, se ele não estiver no ar)
+
+    Gera (video_path, resumo, erro) na ordem dos vídeos; resumo tem vtt_path,
+    txt_path, text (até 1000 caracteres) e full_length. `on_stage` recebe as
+    etapas de cada vídeo, como em iter_pipelined_transcriptions.
+    """
+    conn = connect_transcription_service()
+    if conn is None:
+        yield from transcribe_and_save(video_paths, model_size, on_stage=on_stage)
+        return
+    paths = {str(path): path for path in video_paths}
+    with conn:
+        conn.send({'op': 'transcribe', 'model': model_size, 'videos': list(paths)})
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                raise Exception('O serviço de transcrição encerrou a conexão')
+            if message[0] == 'result':
+                _, path, summary, error = message
+                yield paths[path], summary, error
+            elif message[0] == 'stage':
+                if on_stage:
+                    on_stage(paths[message[1]], message[2])
+            elif message[0] == 'error':
+                raise Exception(message[1])
+            else:
+                return
+
+def transcription_service_stats():
+    """Estatísticas dos modelos no serviço de transcrição, ou None se ele não estiver no ar"""
+    conn = connect_transcription_service()
+    if conn is None:
+        return None
+    try:
+        with conn:
+            conn.send({'op': 'stats'})
+            return conn.recv()[1]
+    except (OSError, EOFError):
+        return None
+
+class TranscriptionService:
+    """Processo dedicado: recebe jobs dos workers web e os executa um de cada vez"""
+
+    def __init__(self):
+        self.jobs = queue.Queue()
+        # Vídeos longos em trechos paralelos só no serviço: um pool para todos os workers web
+        self.parallel_pool = ParallelTranscriptionPool(TRANSCRIBE_PARALLEL_WORKERS) if TRANSCRIBE_PARALLEL_WORKERS > 1 else None
+
+    def serve(self):
+        # Chave nova a cada início; só quem lê a pasta de estado consegue se conectar
+        authkey = os.urandom(32)
+        tmp_key = TRANSCRIPTION_KEY_FILE.with_suffix('.tmp')
+        tmp_key.write_bytes(authkey)
+        os.chmod(tmp_key, 0o600)
+        os.replace(tmp_key, TRANSCRIPTION_KEY_FILE)
+        TRANSCRIPTION_SOCKET.unlink(missing_ok=True)
+        listener = Listener(str(TRANSCRIPTION_SOCKET), family='AF_UNIX', authkey=authkey)
+        threading.Thread(target=self._run_jobs, name='transcription-jobs', daemon=True).start()
+        if WHISPER_PRELOAD:
+            threading.Thread(target=preload_whisper_models, name='whisper-preload', daemon=True).start()
+        print(f"Serviço de transcrição ouvindo em {TRANSCRIPTION_SOCKET}")
+        # SIGTERM (enviado pelo gunicorn ao sair) passa pelo finally e remove o socket
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError, multiprocessing.AuthenticationError) as e:
+                    print(f"Conexão recusada no serviço de transcrição: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+            TRANSCRIPTION_SOCKET.unlink(missing_ok=True)
+            if self.parallel_pool is not None:
+                self.parallel_pool.shutdown()
+
+    def _handle(self, conn):
+        with conn:
+            try:
+                request_data = conn.recv()
+            except (OSError, EOFError):
+                return
+            if request_data.get('op') == 'stats':
+                conn.send(('stats', {
+                    **whisper_models.stats(),
+                    'queued_jobs': self.jobs.qsize(),
+                    'parallel_pool': self.parallel_pool.stats() if self.parallel_pool is not None else None,
+                }))
+                return
+            job = {
+                'model': request_data.get('model', 'base'),
+                'videos': [Path(path) for path in request_data.get('videos', [])],
+                'results': queue.Queue(),
+                'cancelled': threading.Event()
+            }
+            self.jobs.put(job)
+            while True:
+                try:
+                    message = job['results'].get(timeout=1)
+                except queue.Empty:
+                    # Cliente não envia nada após o pedido: dados ou EOF aqui = desconectou
+                    if conn.poll():
+                        job['cancelled'].set()
+                        return
+                    continue
+                try:
+                    conn.send(message)
+                except OSError:
+                    job['cancelled'].set()
+                    return
+                if message[0] not in ('result', 'stage'):
+                    return
+
+    def _run_jobs(self):
+        while True:
+            job = self.jobs.get()
+            if job['cancelled'].is_set():
+                continue
+            def on_stage(video_path, stage):
+                job['results'].put(('stage', str(video_path), stage))
+            try:
+                for video_path, summary, error in transcribe_and_save(job['videos'], job['model'], job['cancelled'],
+                                                                      on_stage, self.parallel_pool):
+                    job['results'].put(('result', str(video_path), summary, error))
+                job['results'].put(('done',))
+            except Exception as e:
+                job['results'].put(('error', str(e)))
+            finally:
+                gc.collect()
+
 @app.route('/api/transcribe-course', methods=['POST'])
 def transcribe_course():
     """Transcreve todos os vídeos de um curso que não têm legendas"""
@@ -1110,12 +3792,7 @@ def transcribe_course():
                 'total': len(videos)
             })
         
-        # Carrega modelo Whisper uma vez
-        print(f"Carregando modelo Whisper: {model_size}")
-        model = whisper.load_model(model_size)
-        
-        ffmpeg_path = shutil.which('ffmpeg')
-        if not ffmpeg_path:
+        if not shutil.which('ffmpeg'):
             return jsonify({
                 'success': False,
                 'error': 'ffmpeg não encontrado'
@@ -1124,54 +3801,25 @@ def transcribe_course():
         processed = []
         errors = []
         
-        for video_info in videos_to_transcribe:
-            video_path = course_path / video_info['name']
-            try:
-                # Extrai áudio
-                audio_path = course_path / f"{video_path.stem}_temp_audio.wav"
-                print(f"Extraindo áudio de {video_path.name}...")
-                subprocess.run([
-                    ffmpeg_path, '-i', str(video_path),
-                    '-ar', '16000',
-                    '-ac', '1',
-                    '-y',
-                    str(audio_path)
-                ], capture_output=True, check=True)
-                
-                # Transcreve
-                print(f"Transcrevendo {video_path.name}...")
-                result = model.transcribe(
-                    str(audio_path),
-                    language='pt',
-                    task='transcribe'
-                )
-                
-                # Salva VTT
-                vtt_path = course_path / f"{video_path.stem}.pt.vtt"
-                whisper_result_to_vtt(result, vtt_path)
-                
-                # Salva texto também
-                txt_path = course_path / f"{video_path.stem}_whisper.txt"
-                txt_path.write_text(result['text'], encoding='utf-8')
-                
-                # Remove áudio temporário
-                if audio_path.exists():
-                    audio_path.unlink()
-                
-                processed.append({
-                    'video': video_info['name'],
-                    'vtt_file': vtt_path.name
-                })
-                
-            except Exception as e:
+        video_paths = [course_path / v['name'] for v in videos_to_transcribe]
+        missing = set(video_paths)
+        for video_path, summary, error in transcribe_videos(video_paths, model_size):
+            missing.discard(video_path)
+            if error:
                 errors.append({
-                    'video': video_info['name'],
-                    'error': str(e)
+                    'video': video_path.name,
+                    'error': error
                 })
-                # Remove áudio temporário em caso de erro
-                audio_path = course_path / f"{video_path.stem}_temp_audio.wav"
-                if audio_path.exists():
-                    audio_path.unlink()
+                continue
+            processed.append({
+                'video': video_path.name,
+                'vtt_file': Path(summary['vtt_path']).name
+            })
+        # Vídeos que ficaram sem resultado (ex.: job cancelado no serviço) contam como erro
+        errors.extend(
+            {'video': video_path.name, 'error': 'A transcrição terminou sem retornar resultado'}
+            for video_path in video_paths if video_path in missing
+        )
         
         return jsonify({
             'success': True,
@@ -1191,9 +3839,276 @@ def transcribe_course():
             'error': str(e)
         }), 400
 
+# Lote de transcrição de todos os cursos: manifesto por vídeo no SQLite, retomado após
+# timeouts ou reinícios. Um único worker executa o lote por vez (posse renovada por heartbeat)
+TRANSCRIBE_BATCH_MAX_ATTEMPTS = int(os.getenv('TRANSCRIBE_BATCH_MAX_ATTEMPTS', '3'))
+TRANSCRIBE_BATCH_RETRY_SECONDS = int(os.getenv('TRANSCRIBE_BATCH_RETRY_SECONDS', '60'))
+TRANSCRIBE_BATCH_HEARTBEAT_SECONDS = 10
+# Sem heartbeat por mais que isso, o lote é considerado interrompido e pode ser retomado
+TRANSCRIBE_BATCH_STALE_SECONDS = 60
+MANIFEST_STATUSES = ('pending', 'extracting', 'transcribing', 'done', 'failed')
+MANIFEST_FAILURES_LIMIT = 50
+
+class TranscriptionBatch:
+    """Manifesto do lote: estado, tentativas e erro de cada vídeo, mais a posse do lote"""
+
+    def __init__(self):
+        conn = get_state_db()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS transcription_manifest (
+                    path TEXT PRIMARY KEY,
+                    course TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS transcription_batch (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    run_id TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    force INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    resumed_at REAL NOT NULL,
+                    heartbeat_at REAL NOT NULL,
+                    finished_at REAL
+                )
+            """)
+
+    def key(self, video_path):
+        """Chave do vídeo no manifesto: caminho relativo à pasta de downloads"""
+        return video_path.resolve().relative_to(DOWNLOAD_FOLDER.resolve()).as_posix()
+
+    def _batch(self):
+        return get_state_db().execute('SELECT * FROM transcription_batch WHERE id = 1').fetchone()
+
+    def start(self, entries, model_size, force):
+        """Inicia um lote com [(caminho relativo, curso)] ou retoma o interrompido
+
+        Retorna (run_id, retomado); run_id é None se outro worker já está executando o lote.
+        """
+        now = time.time()
+        conn = get_state_db()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            batch = self._batch()
+            if batch and batch['status'] == 'running' and now - batch['heartbeat_at'] < TRANSCRIBE_BATCH_STALE_SECONDS:
+                return None, False
+            resumed = batch is not None and batch['status'] == 'running'
+            if resumed:
+                # Mantém o que já terminou; vídeos interrompidos no meio voltam para a fila
+                model_size, force, created_at = batch['model'], bool(batch['force']), batch['created_at']
+                conn.execute("""
+                    UPDATE transcription_manifest
+                    SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                        error = 'Interrompido durante a transcrição', updated_at = ?
+                    WHERE status IN ('extracting', 'transcribing')
+                """, (TRANSCRIBE_BATCH_MAX_ATTEMPTS, now))
+            else:
+                created_at = now
+                conn.execute('DELETE FROM transcription_manifest')
+            conn.executemany(
+                "INSERT OR IGNORE INTO transcription_manifest (path, course, status, updated_at) VALUES (?, ?, 'pending', ?)",
+                [(path, course, now) for path, course in entries]
+            )
+            run_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT OR REPLACE INTO transcription_batch VALUES (1, ?, ?, ?, 'running', ?, ?, ?, NULL)",
+                (run_id, model_size, int(force), created_at, now, now)
+            )
+        return run_id, resumed
+
+    def _heartbeat(self, run_id):
+        conn = get_state_db()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE transcription_batch SET heartbeat_at = ? WHERE run_id = ? AND status = 'running'",
+                (time.time(), run_id)
+            )
+        return cursor.rowcount == 1
+
+    def _keep_alive(self, run_id, stop):
+        while not stop.wait(TRANSCRIBE_BATCH_HEARTBEAT_SECONDS):
+            if not self._heartbeat(run_id):
+                return
+
+    def _on_stage(self, video_path, stage):
+        conn = get_state_db()
+        with conn:
+            # A tentativa conta ao começar, para que um vídeo que derruba o processo não volte para sempre
+            conn.execute("""
+                UPDATE transcription_manifest
+                SET status = ?, attempts = attempts + (? = 'extracting'), updated_at = ?
+                WHERE path = ?
+            """, (stage, stage, time.time(), self.key(video_path)))
+
+    def _record(self, video_path, error, attempts=None, timed=True):
+        """Grava o resultado de um vídeo; falhas voltam após espera exponencial"""
+        now = time.time()
+        path = self.key(video_path)
+        conn = get_state_db()
+        with conn:
+            if error is None:
+                conn.execute("""
+                    UPDATE transcription_manifest SET status = 'done', error = NULL, updated_at = ?, finished_at = ?
+                    WHERE path = ?
+                """, (now, now if timed else None, path))
+                return
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT status, attempts FROM transcription_manifest WHERE path = ?', (path,)).fetchone()
+            if row is None:
+                return
+            if attempts is None:
+                # Falhou antes de começar (ex.: serviço fora do ar): a tentativa ainda não foi contada
+                attempts = row['attempts'] + (row['status'] not in ('extracting', 'transcribing'))
+            retry_at = now + TRANSCRIBE_BATCH_RETRY_SECONDS * 2 ** max(0, attempts - 1)
+            conn.execute("""
+                UPDATE transcription_manifest SET status = 'failed', attempts = ?, error = ?, next_attempt_at = ?, updated_at = ?
+                WHERE path = ?
+            """, (attempts, error, retry_at, now, path))
+
+    def _ready(self, now):
+        return get_state_db().execute("""
+            SELECT path FROM transcription_manifest
+            WHERE status IN ('pending', 'extracting', 'transcribing')
+               OR (status = 'failed' AND attempts < ? AND next_attempt_at <= ?)
+            ORDER BY path
+        """, (TRANSCRIBE_BATCH_MAX_ATTEMPTS, now)).fetchall()
+
+    def _next_retry_at(self):
+        return get_state_db().execute("""
+            SELECT MIN(next_attempt_at) FROM transcription_manifest WHERE status = 'failed' AND attempts < ?
+        """, (TRANSCRIBE_BATCH_MAX_ATTEMPTS,)).fetchone()[0]
+
+    def run(self, run_id):
+        """Executa o lote até não sobrar vídeo pendente nem nova tentativa"""
+        stop = threading.Event()
+        threading.Thread(target=self._keep_alive, args=(run_id, stop), name='transcription-batch-heartbeat', daemon=True).start()
+        try:
+            while True:
+                batch = self._batch()
+                if batch is None or batch['run_id'] != run_id:
+                    return
+                rows = self._ready(time.time())
+                if not rows:
+                    retry_at = self._next_retry_at()
+                    if retry_at is None:
+                        break
+                    time.sleep(min(max(0.0, retry_at - time.time()), TRANSCRIBE_BATCH_HEARTBEAT_SECONDS))
+                    continue
+                video_paths = []
+                for row in rows:
+                    video_path = DOWNLOAD_FOLDER / row['path']
+                    if not video_path.is_file():
+                        self._record(video_path, 'Arquivo de vídeo não encontrado', attempts=TRANSCRIBE_BATCH_MAX_ATTEMPTS)
+                    elif not batch['force'] and find_subtitle_for_video(video_path):
+                        # Legendado por outra rota enquanto o lote estava parado
+                        self._record(video_path, None, timed=False)
+                    else:
+                        video_paths.append(video_path)
+                # Um único pipeline por passada mantém o modelo ocupado também entre cursos
+                remaining = set(video_paths)
+                try:
+                    for video_path, _, error in transcribe_videos(video_paths, batch['model'], self._on_stage):
+                        remaining.discard(video_path)
+                        self._record(video_path, error)
+                except Exception as e:
+                    for video_path in remaining:
+                        self._record(video_path, str(e))
+        except Exception as e:
+            print(f"Erro no lote de transcrição: {e}")
+        finally:
+            stop.set()
+            conn = get_state_db()
+            with conn:
+                conn.execute(
+                    "UPDATE transcription_batch SET status = 'done', finished_at = ? WHERE run_id = ? AND status = 'running'",
+                    (time.time(), run_id)
+                )
+
+    def status(self):
+        """Progresso do lote: contagens por estado, vazão em vídeos/hora, previsão e falhas"""
+        now = time.time()
+        conn = get_state_db()
+        batch = self._batch()
+        counts = dict.fromkeys(MANIFEST_STATUSES, 0)
+        for row in conn.execute('SELECT status, COUNT(*) AS n FROM transcription_manifest GROUP BY status'):
+            counts[row['status']] = row['n']
+        total = sum(counts.values())
+        exhausted = conn.execute(
+            "SELECT COUNT(*) FROM transcription_manifest WHERE status = 'failed' AND attempts >= ?",
+            (TRANSCRIBE_BATCH_MAX_ATTEMPTS,)
+        ).fetchone()[0]
+        result = {
+            'batch': None,
+            'total': total,
+            'counts': counts,
+            'finished': counts['done'] + exhausted,
+            'progress': round((counts['done'] + exhausted) / total, 4) if total else None,
+            'videos_per_hour': None,
+            'eta_seconds': None,
+            'current': [row['path'] for row in conn.execute(
+                "SELECT path FROM transcription_manifest WHERE status IN ('extracting', 'transcribing') ORDER BY path"
+            )],
+            'failures': [
+                {
+                    'video': row['path'],
+                    'course': row['course'],
+                    'attempts': row['attempts'],
+                    'error': row['error'],
+                    'retry_at': row['next_attempt_at'] if row['attempts'] < TRANSCRIBE_BATCH_MAX_ATTEMPTS else None,
+                }
+                for row in conn.execute(
+                    "SELECT * FROM transcription_manifest WHERE status = 'failed' ORDER BY path LIMIT ?",
+                    (MANIFEST_FAILURES_LIMIT,)
+                )
+            ],
+            'courses': [
+                dict(row) for row in conn.execute("""
+                    SELECT course, COUNT(*) AS total,
+                           SUM(status = 'done') AS done,
+                           SUM(status = 'failed') AS failed
+                    FROM transcription_manifest GROUP BY course ORDER BY course
+                """)
+            ],
+        }
+        if batch is None:
+            return result
+        status = batch['status']
+        if status == 'running' and now - batch['heartbeat_at'] >= TRANSCRIBE_BATCH_STALE_SECONDS:
+            status = 'interrupted'
+        result['batch'] = {
+            'status': status,
+            'model': batch['model'],
+            'force': bool(batch['force']),
+            'created_at': batch['created_at'],
+            'resumed_at': batch['resumed_at'],
+            'heartbeat_at': batch['heartbeat_at'],
+            'finished_at': batch['finished_at'],
+        }
+        # Vazão da execução atual: só vídeos transcritos desde a última retomada
+        elapsed = (batch['finished_at'] or now) - batch['resumed_at']
+        transcribed = conn.execute(
+            'SELECT COUNT(*) FROM transcription_manifest WHERE finished_at >= ?', (batch['resumed_at'],)
+        ).fetchone()[0]
+        if transcribed and elapsed > 0:
+            per_hour = transcribed / elapsed * 3600
+            result['videos_per_hour'] = round(per_hour, 2)
+            if status == 'running':
+                result['eta_seconds'] = round((total - result['finished']) / per_hour * 3600)
+        return result
+
+transcription_batch = TranscriptionBatch()
+
 @app.route('/api/transcribe-all-courses', methods=['POST'])
 def transcribe_all_courses():
-    """Transcreve todos os vídeos de todos os cursos que não têm legendas"""
+    """Inicia (ou retoma) em segundo plano a transcrição dos vídeos sem legendas de todos os cursos"""
     data = request.get_json()
     model_size = data.get('model', 'base')
     force_reprocess = data.get('force', False)
@@ -1207,96 +4122,41 @@ def transcribe_all_courses():
                 'processed': 0
             })
         
-        # Carrega modelo Whisper uma vez
-        print(f"Carregando modelo Whisper: {model_size}")
-        model = whisper.load_model(model_size)
-        
-        ffmpeg_path = shutil.which('ffmpeg')
-        if not ffmpeg_path:
+        if not shutil.which('ffmpeg'):
             return jsonify({
                 'success': False,
                 'error': 'ffmpeg não encontrado'
             }), 400
         
-        total_processed = 0
-        total_errors = 0
-        course_results = []
-        
+        entries = []
         for course in courses:
             course_path = resolve_course_path(course['name'])
-            videos = gather_course_videos(course_path)
-            videos_to_transcribe = [
-                v for v in videos 
-                if not v['has_subtitles'] or force_reprocess
-            ]
-            
-            if not videos_to_transcribe:
-                continue
-            
-            course_processed = 0
-            course_errors = []
-            
-            for video_info in videos_to_transcribe:
-                video_path = course_path / video_info['name']
-                try:
-                    # Extrai áudio
-                    audio_path = course_path / f"{video_path.stem}_temp_audio.wav"
-                    subprocess.run([
-                        ffmpeg_path, '-i', str(video_path),
-                        '-ar', '16000',
-                        '-ac', '1',
-                        '-y',
-                        str(audio_path)
-                    ], capture_output=True, check=True)
-                    
-                    # Transcreve
-                    result = model.transcribe(
-                        str(audio_path),
-                        language='pt',
-                        task='transcribe'
-                    )
-                    
-                    # Salva VTT
-                    vtt_path = course_path / f"{video_path.stem}.pt.vtt"
-                    whisper_result_to_vtt(result, vtt_path)
-                    
-                    # Salva texto
-                    txt_path = course_path / f"{video_path.stem}_whisper.txt"
-                    txt_path.write_text(result['text'], encoding='utf-8')
-                    
-                    # Remove áudio temporário
-                    if audio_path.exists():
-                        audio_path.unlink()
-                    
-                    course_processed += 1
-                    total_processed += 1
-                    
-                except Exception as e:
-                    course_errors.append({
-                        'video': video_info['name'],
-                        'error': str(e)
-                    })
-                    total_errors += 1
-                    # Remove áudio temporário
-                    audio_path = course_path / f"{video_path.stem}_temp_audio.wav"
-                    if audio_path.exists():
-                        audio_path.unlink()
-            
-            if course_processed > 0 or course_errors:
-                course_results.append({
-                    'course': course['name'],
-                    'processed': course_processed,
-                    'errors': len(course_errors),
-                    'error_details': course_errors
-                })
+            for video_info in gather_course_videos(course_path):
+                if not video_info['has_subtitles'] or force_reprocess:
+                    entries.append((transcription_batch.key(course_path / video_info['name']), course['name']))
         
+        # Um lote interrompido (timeout, reinício do container) é retomado do manifesto
+        run_id, resumed = transcription_batch.start(entries, model_size, force_reprocess)
+        if run_id is None:
+            return jsonify({
+                'success': True,
+                'message': 'A transcrição de todos os cursos já está em andamento',
+                'status_url': '/api/transcribe-all-courses/status',
+                **transcription_batch.status()
+            })
+        threading.Thread(target=transcription_batch.run, args=(run_id,), name='transcription-batch', daemon=True).start()
+        status = transcription_batch.status()
+        if resumed:
+            message = f"Transcrição retomada: {status['total'] - status['finished']} de {status['total']} vídeo(s) restantes"
+        else:
+            message = f"Transcrição iniciada: {status['total']} vídeo(s) na fila"
         return jsonify({
             'success': True,
-            'message': f'{total_processed} vídeo(s) transcrito(s) em {len(course_results)} curso(s)',
-            'total_processed': total_processed,
-            'total_errors': total_errors,
-            'courses': course_results
-        })
+            'message': message,
+            'resumed': resumed,
+            'status_url': '/api/transcribe-all-courses/status',
+            **status
+        }), 202
         
     except Exception as e:
         return jsonify({
@@ -1304,6 +4164,11 @@ def transcribe_all_courses():
             'error': str(e)
         }), 400
 
+@app.route('/api/transcribe-all-courses/status')
+def transcribe_all_courses_status():
+    """Progresso do lote de transcrição de todos os cursos"""
+    return jsonify({'success': True, **transcription_batch.status()})
+
 @app.route('/api/create-reels', methods=['POST'])
 def create_reels():
     """Cria cortes virais de um vídeo usando legendas"""
@@ -1317,11 +4182,7 @@ def create_reels():
     
     try:
         # Encontra o arquivo de vídeo
-        video_path = None
-        for file in DOWNLOAD_FOLDER.rglob(video_filename):
-            if file.is_file() and file.suffix in ['.mp4', '.webm', '.mkv', '.m4a']:
-                video_path = file
-                break
+        video_path = media_index.find(video_filename, ['.mp4', '.webm', '.mkv', '.m4a'])
         
         if not video_path:
             return jsonify({'error': 'Arquivo de vídeo não encontrado'}), 404
@@ -1366,12 +4227,13 @@ def create_reels():
         
         # Cria os cortes
         print(f"Criando {len(viral_moments)} cortes...")
-        clips = create_video_clips(video_path, viral_moments, clips_folder)
+        clips, clip_errors = create_video_clips(video_path, viral_moments, clips_folder)
         
         if not clips:
             return jsonify({
                 'success': False,
-                'error': 'Erro ao criar os cortes de vídeo'
+                'error': 'Erro ao criar os cortes de vídeo',
+                'errors': clip_errors
             }), 400
         
         return jsonify({
@@ -1379,7 +4241,8 @@ def create_reels():
             'message': f'{len(clips)} cortes criados com sucesso',
             'clips_folder': clips_folder.name,
             'clips': clips,
-            'count': len(clips)
+            'count': len(clips),
+            'errors': clip_errors
         })
         
     except Exception as e:
@@ -1388,6 +4251,70 @@ def create_reels():
             'error': str(e)
         }), 400
 
+# Tempo de importação do app (sem os módulos carregados sob demanda)
+APP_IMPORT_SECONDS = time.perf_counter() - APP_IMPORT_STARTED
+
+def measure_import_costs(module):
+    """Mede com -X importtime, num interpretador novo, o custo de importar `module`
+
+    Retorna (segundos totais, {dependência direta: segundos acumulados}) ou (None, {})
+    se o módulo não puder ser importado.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, cwd=str(Path(__file__).parent)
+    )
+    if result.returncode != 0:
+        return None, {}
+    total = None
+    children = {}
+    pending = {}
+    # As dependências aparecem antes da linha do pai: um espaço de recuo = primeiro nível
+    # (fecha o bloco), três = dependência direta do bloco atual
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+\s+\|\s+(\d+)\s+\|( +)(\S+)', line)
+        if not match:
+            continue
+        seconds = int(match.group(1)) / 1e6
+        if len(match.group(2)) == 1:
+            if match.group(3) == module:
+                total, children = seconds, pending
+            pending = {}
+        elif len(match.group(2)) == 3:
+            package = match.group(3).split('.')[0]
+            pending[package] = pending.get(package, 0) + seconds
+    return total, dict(sorted(children.items(), key=lambda item: item[1], reverse=True))
+
+@app.route('/api/import-report')
+def import_report():
+    """Custo de importação deste worker e estado dos módulos carregados sob demanda"""
+    return jsonify({
+        'success': True,
+        'app_import_seconds': round(APP_IMPORT_SECONDS, 3),
+        'lazy_modules': {
+            name: {
+                'loaded': module.loaded,
+                'import_seconds': round(module.import_seconds, 3) if module.import_seconds is not None else None
+            }
+            for name, module in LAZY_MODULES.items()
+        },
+        'torch_loaded': 'torch' in sys.modules
+    })
+
 if __name__ == '__main__':
+    if '--transcription-service' in sys.argv:
+        TranscriptionService().serve()
+        sys.exit(0)
+    if '--import-report' in sys.argv:
+        # Relatório de inicialização: o app e suas dependências diretas e, à parte, os módulos sob demanda
+        total, children = measure_import_costs('app')
+        print(f"app importado em {total:.3f}s" if total is not None else 'Falha ao importar o app')
+        for package, seconds in list(children.items())[:15]:
+            print(f"  {package:30s} {seconds:8.3f}s")
+        print('Carregados sob demanda:')
+        for name in LAZY_MODULES:
+            total, _ = measure_import_costs(name)
+            print(f"  {name:30s} {total:8.3f}s" if total is not None else f"  {name:30s} não instalado")
+        sys.exit(0)
     app.run(debug=True, host='0.0.0.0', port=5002)
 
@@ -0,0 +1,261 @@
+"""Benchmark offline dos caminhos críticos (legendas, momentos virais, cortes, cursos e Whisper)
+
+Gera legendas VTT sintéticas e vídeos de teste com as fontes lavfi do ffmpeg,
+sem rede, numa pasta temporária usada como DOWNLOAD_FOLDER. Cada etapa é
+cronometrada e o resultado vai para um JSON; com --baseline, compara com uma
+execução anterior e sai com código 1 se alguma etapa ficou mais lenta que o
+limite.
+
+    python3 benchmark.py --output bench.json
+    python3 benchmark.py --baseline bench.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+WORDS = (
+    'hoje vamos falar sobre como organizar o projeto e entender cada etapa '
+    'do processo com calma para não cometer erros comuns no dia a dia'
+).split()
+SPICE = ['você sabia', 'dica', 'passo a passo', 'importante', 'olha só', 'preste atenção', 'cuidado com', '?']
+
+
+def format_timestamp(seconds):
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds % 60:06.3f}"
+
+
+def write_synthetic_vtt(path, cues, rolling=False, seed=42):
+    """Escreve um VTT com `cues` falas; rolling=True imita as legendas automáticas do YouTube"""
+    rng = random.Random(seed)
+    lines = ['WEBVTT', 'Kind: captions', 'Language: pt', '']
+    current = 0.0
+    previous = ''
+    for _ in range(cues):
+        duration = rng.uniform(1.5, 5.0)
+        text = ' '.join(rng.choices(WORDS, k=rng.randint(4, 14)))
+        if rng.random() < 0.25:
+            text += ' ' + rng.choice(SPICE)
+        end = current + duration
+        if rolling:
+            # Cue com a linha anterior + a nova (com tags de tempo) e um cue de 10ms repetindo a nova
+            tagged = '<c>' + text.replace(' ', '</c><c> ') + '</c>'
+            lines += [f"{format_timestamp(current)} --> {format_timestamp(end)} align:start position:0%",
+                      previous or ' ', tagged, '',
+                      f"{format_timestamp(end)} --> {format_timestamp(end + 0.01)} align:start position:0%",
+                      text, ' ', '']
+            previous = text
+            end += 0.01
+        else:
+            lines += [f"{format_timestamp(current)} --> {format_timestamp(end)}", text, '']
+        current = end
+    path.write_text('\n'.join(lines), encoding='utf-8')
+    return path
+
+
+def make_lavfi_video(ffmpeg_path, path, seconds, gop=50):
+    """Gera um vídeo H.264/AAC de teste (testsrc2 + seno) com keyframe a cada `gop` quadros"""
+    subprocess.run([
+        ffmpeg_path, '-hide_banner', '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', 'testsrc2=size=640x360:rate=25',
+        '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=44100',
+        '-t', str(seconds),
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', str(gop),
+        '-c:a', 'aac', '-shortest', str(path)
+    ], check=True)
+    return path
+
+
+def timed(repeat, func, setup=None):
+    """Executa func `repeat` vezes (com setup opcional fora da medição) e retorna os tempos"""
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    return {
+        'median': statistics.median(runs),
+        'min': min(runs),
+        'runs': [round(r, 6) for r in runs]
+    }
+
+
+def run_benchmarks(args, workdir):
+    # O app lê DOWNLOAD_FOLDER na importação: estado e caches ficam na pasta temporária
+    os.environ['DOWNLOAD_FOLDER'] = str(workdir)
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import app
+
+    ffmpeg_path = shutil.which('ffmpeg')
+    stages = {}
+
+    vtt_path = write_synthetic_vtt(workdir / 'sintetico.pt.vtt', args.cues)
+    rolling_path = write_synthetic_vtt(workdir / 'rolante.pt.vtt', args.cues, rolling=True)
+
+    def clear_segment_cache():
+        for cache_file in app.SEGMENTS_FOLDER.glob('*.json'):
+            cache_file.unlink()
+
+    stages['parse_vtt_cold'] = timed(args.repeat, lambda: app.parse_vtt_file(vtt_path), clear_segment_cache)
+    stages['parse_vtt_warm'] = timed(args.repeat, lambda: app.parse_vtt_file(vtt_path))
+    stages['parse_vtt_rolling_cold'] = timed(args.repeat, lambda: app.parse_vtt_file(rolling_path), clear_segment_cache)
+
+    segments = app.parse_vtt_file(vtt_path)
+    stages['analyze_viral_moments'] = timed(args.repeat, lambda: app.analyze_viral_moments(segments, 15, 60))
+    stages['timeline_index'] = timed(args.repeat, lambda: app.TimelineIndex(segments))
+
+    if not ffmpeg_path:
+        print('ffmpeg não encontrado: etapas de vídeo ignoradas')
+        return stages
+
+    course = workdir / 'Curso Benchmark'
+    course.mkdir()
+    video = make_lavfi_video(ffmpeg_path, course / 'aula 01.mp4', args.media_seconds)
+    for index in range(2, args.videos + 1):
+        shutil.copy(video, course / f'aula {index:02d}.mp4')
+
+    # Momentos espalhados pelo vídeo, como os de analyze_viral_moments
+    clip_seconds = min(15, args.media_seconds / (args.clips + 1))
+    moments = []
+    for index in range(args.clips):
+        start = index * args.media_seconds / (args.clips + 1)
+        moments.append({'start': start, 'end': start + clip_seconds, 'duration': clip_seconds,
+                        'text': f'momento {index + 1}', 'score': 1})
+    clips_folder = workdir / 'aula_reels'
+
+    def reset_clips():
+        shutil.rmtree(clips_folder, ignore_errors=True)
+
+    stages['create_video_clips'] = timed(
+        args.repeat, lambda: app.create_video_clips(video, moments, clips_folder), reset_clips
+    )
+
+    def clear_probe_cache():
+        conn = app.get_state_db()
+        with conn:
+            conn.execute('DELETE FROM probe_cache')
+
+    stages['gather_course_videos_cold'] = timed(
+        args.repeat, lambda: app.gather_course_videos(course), clear_probe_cache
+    )
+    stages['gather_course_videos_warm'] = timed(args.repeat, lambda: app.gather_course_videos(course))
+
+    if args.whisper_model:
+        # Carrega pelo caminho do arquivo (verificado em main): o whisper não tenta baixar nada
+        model = app.whisper_models.get(str(whisper_model_file(args.whisper_model)))
+        videos = sorted(course.glob('*.mp4'))
+
+        def transcribe_all():
+            for _, _, error in app.iter_pipelined_transcriptions(model, ffmpeg_path, videos):
+                if error:
+                    raise RuntimeError(error)
+
+        stages['whisper_pipeline'] = timed(args.repeat, transcribe_all)
+
+    return stages
+
+
+def whisper_model_file(name):
+    """Arquivo do modelo no cache local do whisper (o mesmo que whisper.load_model usaria) ou o próprio caminho"""
+    import whisper
+    url = whisper._MODELS.get(name)
+    if url is None:
+        return Path(name)
+    cache_root = os.getenv('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return Path(cache_root) / 'whisper' / os.path.basename(url)
+
+
+def compare(results, baseline, threshold):
+    """Compara as medianas com a linha de base e retorna as etapas que regrediram"""
+    regressions = []
+    for name, stage in results['stages'].items():
+        previous = baseline.get('stages', {}).get(name)
+        if not previous:
+            print(f"{name:30s} {stage['median']:10.4f}s  (sem linha de base)")
+            continue
+        ratio = stage['median'] / previous['median'] if previous['median'] else 1.0
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSÃO'
+            regressions.append(name)
+        print(f"{name:30s} {stage['median']:10.4f}s  base {previous['median']:.4f}s  {ratio - 1:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline dos caminhos críticos do app')
+    parser.add_argument('--cues', type=int, default=20000, help='Falas por legenda sintética')
+    parser.add_argument('--media-seconds', type=int, default=120, help='Duração do vídeo lavfi')
+    parser.add_argument('--videos', type=int, default=4, help='Vídeos no curso sintético')
+    parser.add_argument('--clips', type=int, default=10, help='Cortes por execução de create_video_clips')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetições por etapa (vale a mediana)')
+    parser.add_argument('--whisper-model', help='Modelo Whisper já baixado para medir a transcrição (ex.: tiny)')
+    parser.add_argument('--output', help='Arquivo JSON de saída')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparação')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Piora máxima tolerada (0.2 = 20%%)')
+    parser.add_argument('--keep', action='store_true', help='Mantém a pasta temporária')
+    args = parser.parse_args()
+    if args.whisper_model:
+        try:
+            model_file = whisper_model_file(args.whisper_model)
+        except ImportError:
+            parser.error('--whisper-model requer o pacote openai-whisper instalado')
+        if not model_file.is_file():
+            parser.error(f'modelo {args.whisper_model} não encontrado em {model_file}; baixe-o antes '
+                         '(o benchmark não usa a rede)')
+
+    workdir = Path(tempfile.mkdtemp(prefix='yt-benchmark-'))
+    try:
+        stages = run_benchmarks(args, workdir)
+    finally:
+        if args.keep:
+            print(f"Arquivos mantidos em {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'params': {
+            'cues': args.cues,
+            'media_seconds': args.media_seconds,
+            'videos': args.videos,
+            'clips': args.clips,
+            'repeat': args.repeat,
+            'whisper_model': args.whisper_model,
+        },
+        'stages': stages
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding='utf-8')
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        if baseline.get('params') != results['params']:
+            print('Aviso: parâmetros diferentes da linha de base')
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} etapa(s) acima do limite de {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+    else:
+        for name, stage in stages.items():
+            print(f"{name:30s} {stage['median']:10.4f}s")
+
+
+if __name__ == '__main__':
+    main()
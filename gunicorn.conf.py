@@ -0,0 +1,37 @@
+# Configuração do gunicorn (carregada automaticamente quando ele roda na pasta do projeto)
+# Sobe o serviço de transcrição junto com o servidor: um único processo carrega os
+# modelos Whisper e atende todos os workers pelo socket em downloads/.app/
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+transcription_service = None
+
+
+def when_ready(server):
+    """Inicia o serviço de transcrição antes dos workers serem criados"""
+    global transcription_service
+    if os.getenv('TRANSCRIPTION_SERVICE', 'auto') == 'off':
+        return
+    app_dir = Path(__file__).resolve().parent
+    # Os workers herdam a variável e deixam o pré-carregamento dos modelos para o serviço
+    os.environ['TRANSCRIPTION_SERVICE_MANAGED'] = '1'
+    # Com -c o processo principal não tem arquivo de script, então os processos do pool
+    # de transcrição paralela (spawn) não reimportam o app
+    transcription_service = subprocess.Popen(
+        [sys.executable, '-c', 'import app; app.TranscriptionService().serve()'],
+        cwd=str(app_dir)
+    )
+    server.log.info("Serviço de transcrição iniciado (pid %s)", transcription_service.pid)
+
+
+def on_exit(server):
+    """Encerra o serviço de transcrição junto com o gunicorn"""
+    if transcription_service is None or transcription_service.poll() is not None:
+        return
+    transcription_service.terminate()
+    try:
+        transcription_service.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        transcription_service.kill()
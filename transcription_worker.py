@@ -0,0 +1,42 @@
+# Processo auxiliar da transcrição paralela de vídeos longos (ver ParallelTranscriptionPool em app.py)
+# Fica fora do app.py porque o pool usa 'spawn' e cada processo importa este módulo. O spawn
+# também reimporta o script principal: com o serviço iniciado pelo gunicorn.conf.py ele não
+# tem arquivo e nada mais é carregado; com `python app.py --transcription-service`, o app é
+# reimportado como __mp_main__, sem as threads de fundo (BACKGROUND_TASKS)
+import subprocess
+
+WHISPER_SAMPLE_RATE = 16000
+
+model = None
+
+
+def init_worker(model_size, threads):
+    """Carrega o modelo uma vez por processo do pool"""
+    global model
+    import whisper
+    try:
+        import torch
+        # Divide os núcleos entre os processos em vez de cada um disputar todos
+        torch.set_num_threads(max(1, threads))
+    except ImportError:
+        pass
+    model = whisper.load_model(model_size)
+
+
+def transcribe_chunk(ffmpeg_path, media_path, start, duration):
+    """Decodifica e transcreve o trecho [start, start + duration) do arquivo (None: até o fim)"""
+    import numpy as np
+    cmd = [ffmpeg_path, '-nostdin', '-v', 'error', '-ss', f'{start:.3f}']
+    if duration is not None:
+        cmd += ['-t', f'{duration:.3f}']
+    cmd += [
+        '-i', str(media_path),
+        '-f', 's16le',
+        '-ac', '1',
+        '-ar', str(WHISPER_SAMPLE_RATE),
+        '-'
+    ]
+    proc = subprocess.run(cmd, capture_output=True, check=True)
+    audio = np.frombuffer(proc.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+    del proc
+    return model.transcribe(audio, language='pt', task='transcribe')